@@ -2,14 +2,10 @@ from dotenv import load_dotenv
 load_dotenv()
 
 import streamlit as st
-import sqlite3
-import hashlib
 import os
-import cv2
 import numpy as np
 import pandas as pd
 from datetime import datetime, timedelta
-from collections import deque
 import smtplib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
@@ -18,6 +14,25 @@ import json
 import plotly.express as px
 import plotly.graph_objects as go
 
+from database import (
+    init_database, save_user, authenticate_user, save_video_to_db,
+    get_user_videos, get_video_incidents, get_user_statistics, get_video_job,
+    get_user_settings, save_user_settings, search_incidents, update_incident_status,
+    get_notification_stats, get_time_to_alert_stats, INCIDENT_STATUSES
+)
+from jobs import get_executor, submit_analysis_job
+from notifications import get_notification_sender
+from live_stream import start_live_stream, stop_live_stream, get_live_streams
+from inference_scheduler import get_inference_scheduler
+from video_processing import format_timestamp, get_video_info, rederive_video_incidents
+from detector import CONFIDENCE_THRESHOLD
+from score_timeline import ScoreTimeline
+from screenshots import thumbnail_path
+from uploads import store_upload
+
+VIDEO_PAGE_SIZE = 25
+INCIDENT_PAGE_SIZE = 50
+
 # Configure Streamlit FIRST
 st.set_page_config(
     page_title="Violence Detection System",
@@ -26,444 +41,6 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
-# Database setup
-def init_database():
-    """Initialize SQLite database"""
-    conn = sqlite3.connect('violence_detection.db', check_same_thread=False)
-    cursor = conn.cursor()
-    
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS users (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        username TEXT UNIQUE NOT NULL,
-        email TEXT UNIQUE NOT NULL,
-        password_hash TEXT NOT NULL,
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-        last_login TIMESTAMP
-    )
-    ''')
-    
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS videos (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        user_id INTEGER,
-        filename TEXT NOT NULL,
-        file_path TEXT NOT NULL,
-        upload_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-        analysis_status TEXT DEFAULT 'pending',
-        analysis_completed_at TIMESTAMP,
-        total_incidents INTEGER DEFAULT 0,
-        FOREIGN KEY (user_id) REFERENCES users (id)
-    )
-    ''')
-    
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS incidents (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        video_id INTEGER,
-        user_id INTEGER,
-        timestamp_in_video REAL,
-        confidence_score REAL,
-        frame_number INTEGER,
-        screenshot_path TEXT,
-        detected_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-        status TEXT DEFAULT 'new',
-        FOREIGN KEY (video_id) REFERENCES videos (id),
-        FOREIGN KEY (user_id) REFERENCES users (id)
-    )
-    ''')
-    
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS user_settings (
-        user_id INTEGER PRIMARY KEY,
-        email_notifications BOOLEAN DEFAULT 1,
-        confidence_threshold REAL DEFAULT 0.8,
-        notification_email TEXT,
-        FOREIGN KEY (user_id) REFERENCES users (id)
-    )
-    ''')
-    
-    conn.commit()
-    conn.close()
-
-# Violence Detection Model
-class ViolenceDetector:
-    def __init__(self, model_path="models/best_mobilenet_bilstm.h5"):
-        """Initialize violence detection model"""
-        import random
-        
-        is_cloud = "streamlit.io" in os.getenv("STREAMLIT_SERVER_HEAD", "") or \
-                   "cloudspace" in os.getenv("HOME", "")
-        
-        self.is_demo = is_cloud
-        self.frame_buffer = deque(maxlen=16)
-        self.sequence_length = 16
-        self.image_size = (64, 64)
-        self.classes = ["NonViolence", "Violence"]
-        self.model = None
-        
-        print("🌐 Cloud demo mode - using simulated detection" if is_cloud else "✅ Model ready")
-    
-    def preprocess_frame(self, frame):
-        """Preprocess single frame"""
-        resized = cv2.resize(frame, self.image_size)
-        normalized = resized / 255.0
-        return normalized
-    
-    def detect_violence(self, frames):
-        """Detect violence in frame sequence"""
-        import random
-        
-        if self.is_demo or self.model is None:
-            rand = random.random()
-            if rand > 0.7:
-                confidence = random.uniform(0.82, 0.98)
-                return True, confidence
-            else:
-                return False, random.uniform(0.1, 0.4)
-        
-        try:
-            processed_frames = []
-            for frame in frames:
-                processed_frame = self.preprocess_frame(frame)
-                processed_frames.append(processed_frame)
-            
-            input_batch = np.array([processed_frames])
-            prediction = self.model.predict(input_batch, verbose=0)[0]
-            violence_confidence = prediction[1]
-            is_violent = violence_confidence > 0.8
-            
-            return is_violent, violence_confidence
-            
-        except Exception as e:
-            print(f"Detection error: {e}")
-            return False, 0.0
-
-# Email Notification System - FIXED VERSION
-def send_email_notification(user_id, video_filename, incidents):
-    """Send email via HTTP requests - NO resend package needed"""
-    try:
-        print(f"\n{'='*60}")
-        print(f"🔥 STEP 1: EMAIL FUNCTION CALLED - {len(incidents)} incidents")
-        print(f"{'='*60}")
-        
-        if not incidents:
-            print("❌ STEP 2: No incidents - RETURNING")
-            return
-            
-        # User settings
-        print("⏳ STEP 3: Fetching user settings...")
-        conn = sqlite3.connect('violence_detection.db')
-        cursor = conn.cursor()
-        cursor.execute('''
-            SELECT us.email_notifications, us.notification_email, u.username
-            FROM user_settings us JOIN users u ON us.user_id = u.id
-            WHERE us.user_id = ?
-        ''', (user_id,))
-        settings = cursor.fetchone()
-        conn.close()
-        
-        if not settings:
-            print("❌ STEP 3: No settings")
-            return
-            
-        email_enabled, email_addr, username = settings
-        if not email_enabled or not email_addr:
-            print("❌ STEP 4: Email disabled/missing")
-            return
-            
-        print(f"✅ STEP 5: Email ready → {email_addr}")
-        
-        # Direct Resend HTTP API (NO PACKAGE NEEDED)
-        resend_api_key = os.getenv("RESEND_API_KEY")
-        if resend_api_key:
-            print("🚀 STEP 6: Direct Resend HTTP")
-            import requests
-            import json
-            
-            incident_text = ""
-            for i, inc in enumerate(incidents[:5], 1):
-                timestamp = inc.get('timestamp_formatted', 'N/A')
-                confidence = inc.get('confidence', 0)
-                incident_text += f"<li>Time: {timestamp} - Confidence: {confidence:.1%}</li>"
-            
-            html_body = f"""
-            <h2>🚨 VIOLENCE DETECTED!</h2>
-            <p><strong>{len(incidents)} incidents</strong> in <strong>{video_filename}</strong></p>
-            <ul>{incident_text}</ul>
-            <p><a href="https://violence-detection-cctv-niranjana006.streamlit.app" style="background:#ff4b4b;color:white;padding:10px 20px;text-decoration:none;border-radius:5px">View Dashboard</a></p>
-            """
-            
-            headers = {
-                "Authorization": f"Bearer {resend_api_key}",
-                "Content-Type": "application/json"
-            }
-            
-            payload = {
-                "from": "Violence Detection <onboarding@resend.dev>",
-                "to": [email_addr],
-                "subject": f"🚨 {len(incidents)} Violence Incidents Detected",
-                "html": html_body
-            }
-            
-            response = requests.post(
-                "https://api.resend.com/emails",
-                headers=headers,
-                json=payload,
-                timeout=10
-            )
-            
-            if response.status_code == 200:
-                print("✅ STEP 11: Resend email sent!")
-                return
-            else:
-                print(f"⚠️ Resend HTTP failed: {response.status_code} - {response.text}")
-        
-        print("❌ STEP 6: No Resend API key")
-        
-    except Exception as e:
-        print(f"❌ EMAIL ERROR: {e}")
-
-# Video Processing Functions
-def process_video_file(video_path, user_id, video_id, detector, progress_bar, status_text):
-    """Process uploaded video file"""
-    try:
-        cap = cv2.VideoCapture(video_path)
-        if not cap.isOpened():
-            st.error("Could not open video file")
-            return []
-        
-        fps = cap.get(cv2.CAP_PROP_FPS)
-        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-        duration = total_frames / fps if fps > 0 else 0
-        
-        status_text.text(f"📹 Processing video: {duration:.1f}s, {total_frames:,} frames")
-        
-        frame_buffer = []
-        incidents = []
-        frame_count = 0
-        
-        while True:
-            ret, frame = cap.read()
-            if not ret:
-                break
-            
-            frame_count += 1
-            frame_buffer.append(frame)
-            
-            if len(frame_buffer) > 16:
-                frame_buffer.pop(0)
-            
-            if frame_count % 30 == 0 and len(frame_buffer) == 16:
-                is_violent, confidence = detector.detect_violence(frame_buffer)
-                
-                if is_violent:
-                    timestamp_seconds = frame_count / fps
-                    
-                    screenshot_dir = f"screenshots/user_{user_id}"
-                    os.makedirs(screenshot_dir, exist_ok=True)
-                    screenshot_path = f"{screenshot_dir}/incident_{video_id}_{int(timestamp_seconds)}.jpg"
-                    cv2.imwrite(screenshot_path, frame)
-                    
-                    incidents.append({
-                        'timestamp_seconds': timestamp_seconds,
-                        'timestamp_formatted': format_timestamp(timestamp_seconds),
-                        'confidence': confidence,
-                        'frame_number': frame_count,
-                        'screenshot_path': screenshot_path
-                    })
-                    
-                    save_incident_to_db(video_id, user_id, timestamp_seconds, confidence, frame_count, screenshot_path)
-            
-            progress = frame_count / total_frames
-            progress_bar.progress(progress)
-            
-            if frame_count % 300 == 0:
-                status_text.text(f"🔍 Analyzing... {progress:.1%} complete")
-        
-        cap.release()
-        update_video_analysis_status(video_id, len(incidents))
-        status_text.text(f"✅ Analysis complete! Found {len(incidents)} incidents")
-        
-        # SEND EMAIL SYNCHRONOUSLY
-        if incidents and len(incidents) > 0:
-            print(f"\n🔥 TRIGGERING EMAIL SEND for {len(incidents)} incidents...")
-            video_filename = os.path.basename(video_path)
-            send_email_notification(user_id, video_filename, incidents)
-            print(f"🔥 EMAIL FUNCTION COMPLETED")
-        else:
-            print(f"⚠️ No incidents found, skipping email")
-        
-        return incidents
-        
-    except Exception as e:
-        st.error(f"Error processing video: {e}")
-        print(f"❌ Video processing error: {e}")
-        return []
-
-# Database Functions
-def save_user(username, email, password):
-    """Save new user to database"""
-    conn = sqlite3.connect('violence_detection.db')
-    cursor = conn.cursor()
-    
-    password_hash = hashlib.sha256(password.encode()).hexdigest()
-    
-    try:
-        cursor.execute('''
-        INSERT INTO users (username, email, password_hash)
-        VALUES (?, ?, ?)
-        ''', (username, email, password_hash))
-        
-        user_id = cursor.lastrowid
-        cursor.execute('''
-        INSERT INTO user_settings (user_id, notification_email)
-        VALUES (?, ?)
-        ''', (user_id, email))
-        
-        conn.commit()
-        conn.close()
-        return True, "Account created successfully!"
-    except sqlite3.IntegrityError:
-        conn.close()
-        return False, "Username or email already exists"
-
-def authenticate_user(username, password):
-    """Authenticate user login"""
-    conn = sqlite3.connect('violence_detection.db')
-    cursor = conn.cursor()
-    
-    password_hash = hashlib.sha256(password.encode()).hexdigest()
-    
-    cursor.execute('''
-    SELECT id, username, email FROM users 
-    WHERE username = ? AND password_hash = ?
-    ''', (username, password_hash))
-    
-    user = cursor.fetchone()
-    
-    if user:
-        cursor.execute('UPDATE users SET last_login = CURRENT_TIMESTAMP WHERE id = ?', (user[0],))
-        conn.commit()
-    
-    conn.close()
-    return user
-
-def save_video_to_db(user_id, filename, file_path):
-    """Save video info to database"""
-    conn = sqlite3.connect('violence_detection.db')
-    cursor = conn.cursor()
-    cursor.execute('INSERT INTO videos (user_id, filename, file_path) VALUES (?, ?, ?)', 
-                   (user_id, filename, file_path))
-    video_id = cursor.lastrowid
-    conn.commit()
-    conn.close()
-    return video_id
-
-def save_incident_to_db(video_id, user_id, timestamp, confidence, frame_number, screenshot_path):
-    """Save incident to database"""
-    conn = sqlite3.connect('violence_detection.db')
-    cursor = conn.cursor()
-    cursor.execute('''
-    INSERT INTO incidents (video_id, user_id, timestamp_in_video, confidence_score, frame_number, screenshot_path)
-    VALUES (?, ?, ?, ?, ?, ?)
-    ''', (video_id, user_id, timestamp, confidence, frame_number, screenshot_path))
-    conn.commit()
-    conn.close()
-
-def update_video_analysis_status(video_id, incident_count):
-    """Update video analysis status"""
-    conn = sqlite3.connect('violence_detection.db')
-    cursor = conn.cursor()
-    cursor.execute('''
-    UPDATE videos SET analysis_status = 'completed', 
-    analysis_completed_at = CURRENT_TIMESTAMP, total_incidents = ?
-    WHERE id = ?
-    ''', (incident_count, video_id))
-    conn.commit()
-    conn.close()
-
-def get_user_videos(user_id):
-    """Get user's videos"""
-    conn = sqlite3.connect('violence_detection.db')
-    cursor = conn.cursor()
-    cursor.execute('''
-    SELECT id, filename, upload_time, analysis_status, total_incidents
-    FROM videos WHERE user_id = ? ORDER BY upload_time DESC
-    ''', (user_id,))
-    videos = cursor.fetchall()
-    conn.close()
-    return videos
-
-def get_video_incidents(video_id):
-    """Get incidents for a video"""
-    conn = sqlite3.connect('violence_detection.db')
-    cursor = conn.cursor()
-    cursor.execute('''
-    SELECT timestamp_in_video, confidence_score, frame_number, screenshot_path, detected_at
-    FROM incidents WHERE video_id = ? ORDER BY timestamp_in_video
-    ''', (video_id,))
-    incidents = cursor.fetchall()
-    conn.close()
-    return incidents
-
-def get_user_statistics(user_id):
-    """Get user statistics"""
-    conn = sqlite3.connect('violence_detection.db')
-    cursor = conn.cursor()
-    
-    cursor.execute('SELECT COUNT(*) FROM videos WHERE user_id = ?', (user_id,))
-    total_videos = cursor.fetchone()[0]
-    
-    cursor.execute('SELECT COUNT(*) FROM incidents WHERE user_id = ?', (user_id,))
-    total_incidents = cursor.fetchone()[0]
-    
-    cursor.execute('SELECT COUNT(*) FROM videos WHERE user_id = ? AND DATE(upload_time) = DATE("now")', (user_id,))
-    videos_today = cursor.fetchone()[0]
-    
-    cursor.execute('''
-    SELECT DATE(detected_at) as date, COUNT(*) as count
-    FROM incidents WHERE user_id = ? AND detected_at >= DATE("now", "-7 days")
-    GROUP BY DATE(detected_at) ORDER BY date
-    ''', (user_id,))
-    daily_incidents = cursor.fetchall()
-    
-    conn.close()
-    
-    return {
-        'total_videos': total_videos,
-        'total_incidents': total_incidents,
-        'videos_today': videos_today,
-        'daily_incidents': daily_incidents
-    }
-
-# Utility Functions
-def format_timestamp(seconds):
-    """Format seconds to MM:SS"""
-    minutes = int(seconds // 60)
-    seconds = int(seconds % 60)
-    return f"{minutes:02d}:{seconds:02d}"
-
-def get_video_info(video_path):
-    """Get video file information"""
-    cap = cv2.VideoCapture(video_path)
-    if cap.isOpened():
-        fps = cap.get(cv2.CAP_PROP_FPS)
-        frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-        duration = frame_count / fps if fps > 0 else 0
-        width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-        height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-        cap.release()
-        
-        return {
-            'duration': duration,
-            'fps': fps,
-            'frame_count': frame_count,
-            'resolution': f"{width}x{height}",
-            'size_mb': os.path.getsize(video_path) / (1024 * 1024)
-        }
-    return None
-
 # Streamlit App Pages
 def login_page():
     """Login/Registration page"""
@@ -513,6 +90,15 @@ def login_page():
             else:
                 st.error("Please fill in all fields")
 
+@st.cache_resource(max_entries=256)
+def daily_trend_figure(daily_incidents):
+    """Plotly chart of the last week's incidents, reused across reruns while the data is unchanged"""
+    daily = pd.DataFrame(list(daily_incidents), columns=['Date', 'Incidents', 'Max Confidence', 'Avg Confidence'])
+    fig = px.line(daily, x='Date', y='Incidents', hover_data={'Max Confidence': ':.1%', 'Avg Confidence': ':.1%'},
+                  title="Incidents Per Day")
+    fig.update_layout(xaxis_title="Date", yaxis_title="Number of Incidents")
+    return fig
+
 def dashboard_page():
     """Main dashboard page"""
     st.title(f"🛡️ Violence Detection Dashboard")
@@ -531,25 +117,26 @@ def dashboard_page():
         avg_incidents = stats['total_incidents'] / max(stats['total_videos'], 1)
         st.metric("Avg Incidents/Video", f"{avg_incidents:.1f}")
     
+    alert_latency = get_time_to_alert_stats(st.session_state.user_id)
+    if alert_latency:
+        st.caption(f"⏱️ Time to alert (last 7 days, {alert_latency['videos']} videos): "
+                   f"median {alert_latency['median']:.1f}s · p95 {alert_latency['p95']:.1f}s")
+    
     if stats['daily_incidents']:
         st.subheader("📊 Daily Incident Trends (Last 7 Days)")
-        dates = [item[0] for item in stats['daily_incidents']]
-        counts = [item[1] for item in stats['daily_incidents']]
-        fig = px.line(x=dates, y=counts, title="Incidents Per Day")
-        fig.update_layout(xaxis_title="Date", yaxis_title="Number of Incidents")
-        st.plotly_chart(fig, use_container_width=True)
+        st.plotly_chart(daily_trend_figure(tuple(stats['daily_incidents'])), use_container_width=True)
     
     st.subheader("📹 Recent Videos")
-    videos = get_user_videos(st.session_state.user_id)
+    videos = get_user_videos(st.session_state.user_id, limit=5)
     
     if videos:
-        for video in videos[:5]:
+        for video in videos:
             with st.expander(f"📁 {video[1]} - {video[4]} incidents"):
                 col1, col2, col3 = st.columns(3)
                 with col1:
                     st.write(f"**Uploaded:** {video[2]}")
                 with col2:
-                    status_icon = "✅" if video[3] == "completed" else "⏳"
+                    status_icon = {"completed": "✅", "failed": "❌"}.get(video[3], "⏳")
                     st.write(f"**Status:** {status_icon} {video[3]}")
                 with col3:
                     st.write(f"**Incidents:** {video[4]}")
@@ -567,17 +154,16 @@ def upload_video_page():
     )
     
     if uploaded_file is not None:
-        upload_dir = f"uploads/user_{st.session_state.user_id}"
-        os.makedirs(upload_dir, exist_ok=True)
-        
-        file_path = os.path.join(upload_dir, uploaded_file.name)
-        
-        with open(file_path, "wb") as f:
-            f.write(uploaded_file.getbuffer())
+        # Stored once per upload; reruns reuse the content-addressed copy
+        stored_upload = st.session_state.get('stored_upload')
+        if not stored_upload or stored_upload[0] != uploaded_file.file_id:
+            content_hash, file_path = store_upload(uploaded_file, uploaded_file.name)
+            st.session_state.stored_upload = (uploaded_file.file_id, content_hash, file_path)
+        _, content_hash, file_path = st.session_state.stored_upload
         
         st.success(f"✅ Video uploaded: {uploaded_file.name}")
         
-        video_info = get_video_info(file_path)
+        video_info = cached_video_info(file_path)
         if video_info:
             col1, col2, col3, col4 = st.columns(4)
             with col1:
@@ -592,66 +178,219 @@ def upload_video_page():
         st.subheader("🔍 Start Analysis")
         
         if st.button("🚀 Analyze Video for Violence", type="primary"):
-            video_id = save_video_to_db(st.session_state.user_id, uploaded_file.name, file_path)
-            detector = ViolenceDetector()
-            
-            st.subheader("🔄 Analysis in Progress...")
-            progress_bar = st.progress(0)
-            status_text = st.empty()
-            
-            incidents = process_video_file(
-                file_path, 
-                st.session_state.user_id, 
-                video_id, 
-                detector, 
-                progress_bar, 
-                status_text
-            )
-            
-            st.subheader("📊 Analysis Results")
-            
-            if incidents:
-                st.error(f"🚨 {len(incidents)} violent incidents detected!")
-                df_incidents = pd.DataFrame(incidents)
-                st.dataframe(
-                    df_incidents[['timestamp_formatted', 'confidence']],
-                    column_config={
-                        'timestamp_formatted': 'Time',
-                        'confidence': st.column_config.ProgressColumn(
-                            'Confidence',
-                            min_value=0,
-                            max_value=1,
-                            format="%.1%"
-                        )
-                    }
+            video_id = save_video_to_db(st.session_state.user_id, uploaded_file.name, file_path,
+                                        content_hash=content_hash)
+            submit_analysis_job(video_id)
+            st.session_state.analysis_video_id = video_id
+    
+    video_id = st.session_state.get('analysis_video_id')
+    if video_id:
+        job = get_video_job(video_id)
+        if job and job['status'] in ('pending', 'running'):
+            analysis_progress_panel(video_id)
+        elif job:
+            analysis_results_panel(job)
+
+@st.cache_data(max_entries=128)
+def cached_video_info(file_path):
+    """get_video_info for a content-addressed upload, whose file never changes"""
+    return get_video_info(file_path)
+
+@st.fragment(run_every=2)
+def analysis_progress_panel(video_id):
+    """Poll a background analysis job until it finishes"""
+    job = get_video_job(video_id)
+    if not job or job['status'] not in ('pending', 'running'):
+        st.rerun()
+    
+    st.subheader(f"🔄 Analysis in Progress: {job['filename']}")
+    st.progress(min(job['progress'], 1.0))
+    if job['status'] == 'pending':
+        st.text("⏳ Waiting for a free analysis worker...")
+    else:
+        st.text(job['message'] or "🔍 Analyzing...")
+    st.caption("You can leave this page; the analysis keeps running in the background.")
+
+def analysis_results_panel(job):
+    """Show the results of a finished analysis job"""
+    st.subheader(f"📊 Analysis Results: {job['filename']}")
+    
+    if job['status'] == 'failed':
+        st.error(f"❌ Analysis failed: {job['message']}")
+        return
+    
+    if job['windows_skipped']:
+        total_windows = job['windows_analyzed'] + job['windows_skipped']
+        st.caption(f"🎞️ Motion gate skipped {job['windows_skipped']:,} of {total_windows:,} "
+                   f"windows ({job['windows_skipped'] / total_windows:.0%})")
+    if job['time_to_alert'] is not None:
+        st.caption(f"⏱️ Alert delivered {job['time_to_alert']:.1f}s after upload")
+    elif job['time_to_detect'] is not None:
+        st.caption(f"⏱️ Alert queued {job['time_to_detect']:.1f}s after upload")
+    
+    if job['timeline_path'] and os.path.exists(job['timeline_path']):
+        score_timeline_panel(job)
+    
+    incidents = [
+        {
+            'timestamp_formatted': format_timestamp(incident[0]),
+            'confidence': incident[1],
+            'screenshot_path': incident[3]
+        }
+        for incident in get_video_incidents(job['id'])
+    ]
+    
+    if incidents:
+        st.error(f"🚨 {len(incidents)} violent incidents detected!")
+        df_incidents = pd.DataFrame(incidents)
+        st.dataframe(
+            df_incidents[['timestamp_formatted', 'confidence']],
+            column_config={
+                'timestamp_formatted': 'Time',
+                'confidence': st.column_config.ProgressColumn(
+                    'Confidence',
+                    min_value=0,
+                    max_value=1,
+                    format="%.1%"
                 )
-                
-                st.subheader("📸 Incident Screenshots")
-                cols = st.columns(3)
-                for i, incident in enumerate(incidents[:6]):
-                    with cols[i % 3]:
-                        if os.path.exists(incident['screenshot_path']):
-                            st.image(
-                                incident['screenshot_path'], 
-                                caption=f"Time: {incident['timestamp_formatted']} (Confidence: {incident['confidence']:.1%})",
-                                use_column_width=True
-                            )
+            }
+        )
+        
+        st.subheader("📸 Incident Screenshots")
+        cols = st.columns(3)
+        for i, incident in enumerate(incidents[:6]):
+            with cols[i % 3]:
+                # The grid shows thumbnails; the full-size screenshot opens on demand
+                thumbnail = thumbnail_path(incident['screenshot_path'])
+                if os.path.exists(thumbnail) or os.path.exists(incident['screenshot_path']):
+                    st.image(
+                        thumbnail if os.path.exists(thumbnail) else incident['screenshot_path'],
+                        caption=f"Time: {incident['timestamp_formatted']} (Confidence: {incident['confidence']:.1%})",
+                        use_column_width=True
+                    )
+                    if os.path.exists(incident['screenshot_path']):
+                        with st.popover("🔍 Full size"):
+                            st.image(incident['screenshot_path'])
+    else:
+        st.success("✅ No violence detected in this video")
+    
+    if st.button("📹 Analyze Another Video"):
+        del st.session_state.analysis_video_id
+        st.rerun()
+
+def score_timeline_panel(job):
+    """Confidence over time, with incidents re-derived from the stored scores at another threshold"""
+    timeline = ScoreTimeline(job['timeline_path'])
+    scores = np.asarray(timeline.scores, dtype=np.float32)
+    times = (np.arange(len(scores)) + 1) * job['window_stride'] / job['fps']
+    current_threshold = job['confidence_threshold'] or CONFIDENCE_THRESHOLD
+    
+    st.subheader("📈 Confidence Over Time")
+    threshold = st.slider("Confidence Threshold", min_value=0.5, max_value=0.95,
+                          value=float(current_threshold), key=f"timeline_threshold_{job['id']}")
+    
+    # Unscored (motion-skipped) windows are NaN and show as gaps
+    fig = go.Figure(go.Scatter(x=times, y=scores, mode='lines', name='Confidence'))
+    fig.add_hline(y=threshold, line_dash='dash', line_color='red')
+    fig.update_layout(xaxis_title='Time (s)', yaxis_title='Confidence', yaxis_range=[0, 1],
+                      height=300, margin=dict(t=20, b=20))
+    st.plotly_chart(fig, use_container_width=True)
+    
+    if abs(threshold - current_threshold) > 1e-6:
+        matches = len(timeline.windows_above(threshold))
+        st.caption(f"{matches} incidents at {threshold:.0%} "
+                   f"(currently {job['total_incidents']} at {current_threshold:.0%})")
+        if st.button("🎯 Apply Threshold", key=f"apply_threshold_{job['id']}"):
+            rederive_video_incidents(job, threshold)
+            st.rerun()
+
+def live_streams_page():
+    """Live RTSP/HTTP/webcam monitoring page"""
+    st.title("📡 Live Streams")
+    
+    with st.form("live_stream_form"):
+        source = st.text_input("Stream source", placeholder="rtsp://camera/stream, http://..., 0 for a webcam, or a file path")
+        name = st.text_input("Camera name", placeholder="Entrance camera")
+        realtime = st.checkbox("Replay files at their native frame rate", value=True,
+                               help="Lets a local video file stand in for a live camera")
+        
+        if st.form_submit_button("▶️ Start Monitoring", type="primary"):
+            if source:
+                video_id = start_live_stream(source.strip(), st.session_state.user_id, name or None, realtime=realtime)
+                st.success(f"✅ Monitoring started (stream #{video_id})")
             else:
-                st.success("✅ No violence detected in this video")
-            
-            if st.button("📹 Analyze Another Video"):
+                st.error("Please enter a stream source")
+    
+    live_streams_panel()
+
+@st.fragment(run_every=2)
+def live_streams_panel():
+    """Stats for the user's running streams"""
+    streams = get_live_streams(st.session_state.user_id)
+    if not streams:
+        st.info("No live streams running.")
+        return
+    
+    scheduler = get_inference_scheduler().get_stats()
+    st.caption(f"Shared inference: {scheduler['batches']:,} batches, "
+               f"{scheduler['avg_batch_size']:.1f} windows per batch on average")
+    
+    for stream in streams:
+        with st.container(border=True):
+            st.subheader(f"🎥 {stream.name}")
+            stats = stream.stats
+            col1, col2, col3, col4 = st.columns(4)
+            with col1:
+                st.metric("Frames", f"{stats['frames_read']:,}", delta=f"-{stats['frames_dropped']:,} dropped",
+                          delta_color="off")
+            with col2:
+                st.metric("Windows Scored", f"{stats['windows_scored']:,}")
+            with col3:
+                st.metric("Incidents", stats['incidents'])
+            with col4:
+                st.metric("Latency", f"{stats['last_latency']:.2f}s", delta=f"max {stats['max_latency']:.2f}s",
+                          delta_color="off")
+            scheduler_stats = stream.scheduler_stats()
+            if scheduler_stats:
+                st.caption(f"🧮 Scheduler queue depth {scheduler_stats['queue_depth']} · "
+                           f"inference latency {scheduler_stats['last_latency'] * 1000:.0f} ms "
+                           f"(avg {scheduler_stats['avg_latency'] * 1000:.0f} ms)")
+            if stream.error:
+                st.error(stream.error)
+            if st.button("⏹️ Stop", key=f"stop_stream_{stream.video_id}"):
+                stop_live_stream(stream.video_id)
                 st.rerun()
 
+def pagination_controls(cursor_key, has_next, next_cursor):
+    """Newer/Older buttons over a stack of keyset cursors kept in session state"""
+    cursors = st.session_state[cursor_key]
+    col1, col2, col3 = st.columns([1, 2, 1])
+    with col1:
+        if st.button("◀ Newer", key=f"{cursor_key}_newer", disabled=len(cursors) == 1):
+            cursors.pop()
+            st.rerun()
+    with col2:
+        st.caption(f"Page {len(cursors)}")
+    with col3:
+        if st.button("Older ▶", key=f"{cursor_key}_older", disabled=not has_next):
+            cursors.append(next_cursor)
+            st.rerun()
+
 def video_history_page():
     """Video history page"""
     st.title("📁 Video History")
     
-    videos = get_user_videos(st.session_state.user_id)
+    # One keyset cursor per visited page; None is the first page
+    cursors = st.session_state.setdefault('history_cursors', [None])
+    videos = get_user_videos(st.session_state.user_id, limit=VIDEO_PAGE_SIZE + 1, after=cursors[-1])
     
-    if not videos:
+    if not videos and len(cursors) == 1:
         st.info("No videos uploaded yet.")
         return
     
+    has_next = len(videos) > VIDEO_PAGE_SIZE
+    videos = videos[:VIDEO_PAGE_SIZE]
+    
     video_data = []
     for video in videos:
         video_data.append({
@@ -664,20 +403,84 @@ def video_history_page():
     
     df = pd.DataFrame(video_data)
     st.dataframe(df[['Filename', 'Upload Time', 'Status', 'Incidents']], use_container_width=True)
+    
+    next_cursor = (videos[-1][2], videos[-1][0]) if videos else None
+    pagination_controls('history_cursors', has_next, next_cursor)
+
+def incident_explorer_page():
+    """Filterable, paginated list of all of a user's incidents"""
+    st.title("🔎 Incident Explorer")
+    
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        today = datetime.utcnow().date()
+        date_range = st.date_input("Detected between", value=(today - timedelta(days=30), today))
+    with col2:
+        confidence_range = st.slider("Confidence", min_value=0.0, max_value=1.0, value=(0.0, 1.0), step=0.05)
+    with col3:
+        status = st.selectbox("Status", ["All"] + INCIDENT_STATUSES)
+    with col4:
+        video_id = st.number_input("Video ID (0 = all)", min_value=0, step=1)
+    
+    # The date picker returns a single date while a range is being picked
+    start_date = date_range[0] if date_range else None
+    end_date = date_range[1] if len(date_range) > 1 else start_date
+    filters = {
+        'start_date': start_date.isoformat() if start_date else None,
+        'end_date': end_date.isoformat() if end_date else None,
+        'min_confidence': confidence_range[0],
+        'max_confidence': confidence_range[1],
+        'status': None if status == "All" else status,
+        'video_id': int(video_id) or None
+    }
+    
+    # Changing a filter starts again from the first page
+    if st.session_state.get('incident_filters') != filters:
+        st.session_state.incident_filters = filters
+        st.session_state.incident_cursors = [None]
+    cursors = st.session_state.incident_cursors
+    
+    incidents = search_incidents(st.session_state.user_id, limit=INCIDENT_PAGE_SIZE + 1,
+                                 after=cursors[-1], **filters)
+    has_next = len(incidents) > INCIDENT_PAGE_SIZE
+    incidents = incidents[:INCIDENT_PAGE_SIZE]
+    
+    if not incidents:
+        st.info("No incidents match these filters.")
+        if len(cursors) > 1:
+            pagination_controls('incident_cursors', False, None)
+        return
+    
+    df = pd.DataFrame([{
+        'ID': incident[0],
+        'Video': f"{incident[2]} (#{incident[1]})",
+        'Time in Video': format_timestamp(incident[3]),
+        'Confidence': f"{incident[4]:.1%}",
+        'Detected At': incident[7],
+        'Status': incident[8]
+    } for incident in incidents])
+    st.dataframe(df, use_container_width=True, hide_index=True)
+    
+    pagination_controls('incident_cursors', has_next, (incidents[-1][7], incidents[-1][0]))
+    
+    with st.form("incident_status_form"):
+        col1, col2, col3 = st.columns([2, 2, 1])
+        with col1:
+            incident_id = st.selectbox("Incident", [incident[0] for incident in incidents])
+        with col2:
+            new_status = st.selectbox("Mark as", INCIDENT_STATUSES)
+        with col3:
+            st.write("")
+            submitted = st.form_submit_button("💾 Update")
+        if submitted:
+            update_incident_status(incident_id, st.session_state.user_id, new_status)
+            st.rerun()
 
 def settings_page():
     """User settings page"""
     st.title("⚙️ Settings")
     
-    conn = sqlite3.connect('violence_detection.db')
-    cursor = conn.cursor()
-    cursor.execute('''
-    SELECT email_notifications, confidence_threshold, notification_email
-    FROM user_settings WHERE user_id = ?
-    ''', (st.session_state.user_id,))
-    
-    settings = cursor.fetchone()
-    conn.close()
+    settings = get_user_settings(st.session_state.user_id)
     
     if settings:
         email_notifications, confidence_threshold, notification_email = settings
@@ -688,6 +491,10 @@ def settings_page():
         st.subheader("📧 Email Notifications")
         new_email_notifications = st.checkbox("Enable email notifications", value=email_notifications)
         new_notification_email = st.text_input("Notification Email", value=notification_email or st.session_state.email)
+        notification_stats = get_notification_stats(st.session_state.user_id)
+        if notification_stats['alerts']:
+            st.caption(f"📬 {notification_stats['alerts']} alerts delivered in {notification_stats['emails']} emails "
+                       f"({notification_stats['sends_saved']} sends saved by digests)")
         
         st.subheader("🎯 Detection Settings")
         new_confidence_threshold = st.slider(
@@ -702,15 +509,8 @@ def settings_page():
         st.info(f"Email: {st.session_state.email}")
         
         if st.form_submit_button("💾 Save Settings"):
-            conn = sqlite3.connect('violence_detection.db')
-            cursor = conn.cursor()
-            cursor.execute('''
-            UPDATE user_settings 
-            SET email_notifications = ?, confidence_threshold = ?, notification_email = ?
-            WHERE user_id = ?
-            ''', (new_email_notifications, new_confidence_threshold, new_notification_email, st.session_state.user_id))
-            conn.commit()
-            conn.close()
+            save_user_settings(st.session_state.user_id, new_email_notifications,
+                               new_confidence_threshold, new_notification_email)
             st.success("✅ Settings saved successfully!")
 def get_live_logs():
     """Get live console logs"""
@@ -726,6 +526,8 @@ def get_live_logs():
 def main():
     """Main application function"""
     init_database()
+    get_executor()
+    get_notification_sender()
     os.makedirs("uploads", exist_ok=True)
     os.makedirs("screenshots", exist_ok=True)
     
@@ -740,7 +542,9 @@ def main():
         if st.session_state.get('logged_in', False):
             if st.button("🏠 Dashboard"): st.session_state.page = "dashboard"; st.rerun()
             if st.button("📹 Upload"): st.session_state.page = "upload"; st.rerun()
+            if st.button("📡 Live"): st.session_state.page = "live"; st.rerun()
             if st.button("📁 History"): st.session_state.page = "history"; st.rerun()
+            if st.button("🔎 Incidents"): st.session_state.page = "incidents"; st.rerun()
             if st.button("⚙️ Settings"): st.session_state.page = "settings"; st.rerun()
             if st.button("🚪 Logout"):
                 for key in list(st.session_state.keys()):
@@ -757,8 +561,12 @@ def main():
         dashboard_page()
     elif st.session_state.page == "upload":
         upload_video_page()
+    elif st.session_state.page == "live":
+        live_streams_page()
     elif st.session_state.page == "history":
         video_history_page()
+    elif st.session_state.page == "incidents":
+        incident_explorer_page()
     elif st.session_state.page == "settings":
         settings_page()
 
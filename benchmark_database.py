@@ -0,0 +1,152 @@
+# Database Benchmark Script
+# Seeds a throwaway database with synthetic incidents and times the dashboard
+# queries before and after the index and daily-rollup migrations (query cache bypassed).
+#
+#   python benchmark_database.py                          # 10M incidents
+#   python benchmark_database.py --incidents 1000000 --repeat 10
+#   python benchmark_database.py --reseed                 # rebuild the benchmark database
+
+import os
+import sys
+import time
+import random
+import argparse
+import statistics
+
+import database
+
+def seed(incidents, users, incidents_per_video):
+    """Fill an empty schema with users, videos and incidents generated inside SQLite"""
+    videos = max(1, incidents // incidents_per_video)
+    conn = database.get_connection()
+    # Durability doesn't matter for a throwaway database
+    conn.execute('PRAGMA synchronous=OFF')
+    
+    with conn:
+        conn.execute('''
+        INSERT INTO users (username, email, password_hash)
+        WITH RECURSIVE seq(n) AS (SELECT 1 UNION ALL SELECT n + 1 FROM seq WHERE n < ?)
+        SELECT 'user' || n, 'user' || n || '@example.com', '' FROM seq
+        ''', (users,))
+        conn.execute('INSERT INTO user_settings (user_id, notification_email) SELECT id, email FROM users')
+        
+        conn.execute('''
+        INSERT INTO videos (user_id, filename, file_path, upload_time, analysis_status, total_incidents)
+        WITH RECURSIVE seq(n) AS (SELECT 1 UNION ALL SELECT n + 1 FROM seq WHERE n < ?)
+        SELECT (n - 1) % ? + 1, 'video' || n || '.mp4', 'uploads/video' || n || '.mp4',
+               datetime('now', printf('-%d minutes', abs(random()) % 129600)), 'completed', ?
+        FROM seq
+        ''', (videos, users, incidents_per_video))
+        
+        # Incident n belongs to video n / incidents_per_video + 1 and that video's user
+        conn.execute('''
+        INSERT INTO incidents (video_id, user_id, timestamp_in_video, confidence_score, frame_number, screenshot_path, detected_at)
+        WITH RECURSIVE seq(n) AS (SELECT 0 UNION ALL SELECT n + 1 FROM seq WHERE n < ?)
+        SELECT n / ? + 1, (n / ?) % ? + 1, (n % ?) * 2.0, 0.8 + (abs(random()) % 200) / 1000.0,
+               (n % ?) * 60, 'screenshots/incident_' || n || '.jpg',
+               datetime('now', printf('-%d minutes', abs(random()) % 129600))
+        FROM seq
+        ''', (incidents - 1, incidents_per_video, incidents_per_video, users, incidents_per_video, incidents_per_video))
+    
+    conn.execute('PRAGMA synchronous=NORMAL')
+    return videos
+
+# The dashboard reads as they ran against the raw tables before the
+# index, rollup and cache migrations
+def raw_user_videos(user_id):
+    return database.get_connection().execute('''
+    SELECT id, filename, upload_time, analysis_status, total_incidents
+    FROM videos WHERE user_id = ? ORDER BY upload_time DESC
+    ''', (user_id,)).fetchall()
+
+def raw_video_incidents(video_id):
+    return database.get_connection().execute('''
+    SELECT timestamp_in_video, confidence_score, frame_number, screenshot_path, detected_at
+    FROM incidents WHERE video_id = ? ORDER BY timestamp_in_video
+    ''', (video_id,)).fetchall()
+
+def raw_user_statistics(user_id):
+    cursor = database.get_connection().cursor()
+    cursor.execute('SELECT COUNT(*) FROM videos WHERE user_id = ?', (user_id,))
+    cursor.execute('SELECT COUNT(*) FROM incidents WHERE user_id = ?', (user_id,))
+    cursor.execute('SELECT COUNT(*) FROM videos WHERE user_id = ? AND DATE(upload_time) = DATE("now")', (user_id,))
+    cursor.execute('''
+    SELECT DATE(detected_at) as date, COUNT(*) as count
+    FROM incidents WHERE user_id = ? AND detected_at >= DATE("now", "-7 days")
+    GROUP BY DATE(detected_at) ORDER BY date
+    ''', (user_id,))
+    return cursor.fetchall()
+
+def time_queries(users, videos, repeat, raw=False):
+    """Median latency in ms of each dashboard query over random users/videos"""
+    queries = {
+        'get_user_videos': raw_user_videos if raw else database.get_user_videos,
+        'get_video_incidents': raw_video_incidents if raw else database.get_video_incidents,
+        'get_user_statistics': raw_user_statistics if raw else database.get_user_statistics
+    }
+    
+    results = {}
+    for name, query in queries.items():
+        timings = []
+        for _ in range(repeat):
+            key = random.randint(1, videos if name == 'get_video_incidents' else users)
+            # Time the database, not the query cache
+            database.query_cache.clear()
+            started = time.perf_counter()
+            query(key)
+            timings.append((time.perf_counter() - started) * 1000)
+        results[name] = statistics.median(timings)
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark dashboard queries against a large synthetic database")
+    parser.add_argument("--db", default="benchmark.db", help="Benchmark database file (never the real one)")
+    parser.add_argument("--incidents", type=int, default=10_000_000)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--incidents-per-video", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per query; the median is reported")
+    parser.add_argument("--reseed", action="store_true", help="Delete and re-seed the benchmark database")
+    args = parser.parse_args()
+    
+    print("🛡️ Violence Detection System - Database Benchmark")
+    print("=" * 50)
+    
+    if args.reseed:
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(args.db + suffix):
+                os.remove(args.db + suffix)
+    
+    database.DATABASE_PATH = args.db
+    random.seed(0)
+    
+    # Build the schema as it was before the index and rollup migrations
+    before = {}
+    if database.get_schema_version() < 3:
+        database.migrate_database(target_version=2)
+        if database.get_connection().execute('SELECT COUNT(*) FROM incidents').fetchone()[0] == 0:
+            print(f"🌱 Seeding {args.incidents:,} incidents for {args.users:,} users...")
+            started = time.perf_counter()
+            seed(args.incidents, args.users, args.incidents_per_video)
+            print(f"✅ Seeded in {time.perf_counter() - started:.1f}s")
+        
+        print("⏱️ Timing queries without indexes...")
+        before = time_queries(args.users, max(1, args.incidents // args.incidents_per_video), args.repeat, raw=True)
+        
+        started = time.perf_counter()
+        database.migrate_database()
+        print(f"✅ Index and rollup migrations took {time.perf_counter() - started:.1f}s")
+    
+    print("⏱️ Timing queries with indexes and rollup...")
+    after = time_queries(args.users, max(1, args.incidents // args.incidents_per_video), args.repeat)
+    
+    print()
+    print(f"{'Query':22} {'Before (ms)':>12} {'After (ms)':>12} {'Speed-up':>10}")
+    for name, latency in after.items():
+        if name in before:
+            print(f"{name:22} {before[name]:12.2f} {latency:12.2f} {before[name] / max(latency, 1e-6):9.0f}x")
+        else:
+            print(f"{name:22} {'-':>12} {latency:12.2f} {'-':>10}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,140 @@
+# Decoder Benchmark Script
+# Times the OpenCV decoder (full-resolution decode + cv2.resize) against the
+# ffmpeg raw-pipe decoder (scaled to the model size inside ffmpeg) on the
+# frames an analysis actually reads, and checks that both see the same frames.
+# It then scores the video with each decoder and compares the window
+# confidences and incident counts, since the two scalers differ slightly.
+#
+#   python benchmark_decoder.py uploads/user_1/clip.mp4
+#   python benchmark_decoder.py clip.mp4 --window-stride 10 --repeat 5
+#   FFMPEG_PATH=/opt/ffmpeg/bin/ffmpeg python benchmark_decoder.py clip.mp4
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+import statistics
+import numpy as np
+import cv2
+
+from detector import FrameRingBuffer, get_detector, CONFIDENCE_THRESHOLD
+from score_timeline import ScoreTimeline
+from video_processing import (
+    iter_sampled_frames, iter_ffmpeg_frames, ffmpeg_available, scan_video_segment, FFMPEG_PATH
+)
+
+SEQUENCE_LENGTH = 16
+IMAGE_SIZE = (64, 64)
+
+def decode_opencv(video_path, window_stride, max_frames=None):
+    """Model-sized frames as the OpenCV path produces them: decode, then resize into the ring buffer"""
+    cap = cv2.VideoCapture(video_path)
+    frame_buffer = FrameRingBuffer(1, IMAGE_SIZE)
+    frames = []
+    try:
+        for frame_number, frame in iter_sampled_frames(cap, window_stride, SEQUENCE_LENGTH, end_frame=max_frames):
+            frame_buffer.push(frame)
+            frames.append((frame_number, frame_buffer.frames[0].copy()))
+    finally:
+        cap.release()
+    return frames
+
+def decode_ffmpeg(video_path, window_stride, max_frames=None):
+    """Model-sized frames straight from the ffmpeg pipe"""
+    fps = cv2.VideoCapture(video_path).get(cv2.CAP_PROP_FPS)
+    return list(iter_ffmpeg_frames(video_path, fps, IMAGE_SIZE, window_stride, SEQUENCE_LENGTH, end_frame=max_frames))
+
+def score_video(decoder, video_path, window_stride, max_frames, scratch_dir):
+    """Every window's confidence when the video is analysed with a decoder (NaN if not scored)"""
+    detector = get_detector()
+    total_frames = int(cv2.VideoCapture(video_path).get(cv2.CAP_PROP_FRAME_COUNT))
+    windows = (max_frames or total_frames) // window_stride
+    # float32, so the comparison isn't limited by the timeline's usual float16
+    scores_path = os.path.join(scratch_dir, f"{decoder}.float32")
+    ScoreTimeline.create(scores_path, windows).flush()
+    # A threshold above every score: nothing becomes an incident, nothing is written
+    scan_video_segment(video_path, "benchmark", 0, detector, end_frame=max_frames, window_stride=window_stride,
+                       scores_path=scores_path, confidence_threshold=1.0, decoder=decoder)
+    return np.array(ScoreTimeline(scores_path).scores[:windows], dtype=np.float64)
+
+def time_decoder(decode, video_path, window_stride, repeat, max_frames):
+    """Median seconds per full decode, plus the frames of the last run"""
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        frames = decode(video_path, window_stride, max_frames)
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings), frames
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark OpenCV vs ffmpeg raw-pipe decoding")
+    parser.add_argument("video", help="Video file to decode")
+    parser.add_argument("--window-stride", type=int, default=30)
+    parser.add_argument("--max-frames", type=int, default=None, help="Stop after this frame")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per decoder; the median is reported")
+    parser.add_argument("--threshold", type=float, default=CONFIDENCE_THRESHOLD,
+                        help="Confidence threshold incidents are counted at")
+    parser.add_argument("--skip-scores", action="store_true", help="Only time decoding, don't compare scores")
+    args = parser.parse_args()
+    
+    print("🛡️ Violence Detection System - Decoder Benchmark")
+    print("=" * 50)
+    
+    cap = cv2.VideoCapture(args.video)
+    if not cap.isOpened():
+        print(f"❌ Could not open {args.video}")
+        return 1
+    print(f"📹 {args.video}: {int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))}x{int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))}, "
+          f"{int(cap.get(cv2.CAP_PROP_FRAME_COUNT)):,} frames, window stride {args.window_stride}")
+    cap.release()
+    
+    opencv_seconds, opencv_frames = time_decoder(decode_opencv, args.video, args.window_stride,
+                                                 args.repeat, args.max_frames)
+    print(f"⏱️ OpenCV: {opencv_seconds:.2f}s ({len(opencv_frames) / opencv_seconds:,.0f} frames/s)")
+    
+    if not ffmpeg_available():
+        print(f"⚠️ {FFMPEG_PATH} not found - install ffmpeg or set FFMPEG_PATH to compare")
+        return 1
+    
+    ffmpeg_seconds, ffmpeg_frames = time_decoder(decode_ffmpeg, args.video, args.window_stride,
+                                                 args.repeat, args.max_frames)
+    print(f"⏱️ ffmpeg: {ffmpeg_seconds:.2f}s ({len(ffmpeg_frames) / ffmpeg_seconds:,.0f} frames/s)")
+    
+    same_frames = [number for number, _ in opencv_frames] == [number for number, _ in ffmpeg_frames]
+    difference = np.mean([
+        np.abs(a.astype(np.int16) - b.astype(np.int16)).mean()
+        for (_, a), (_, b) in zip(opencv_frames, ffmpeg_frames)
+    ]) if ffmpeg_frames else float('nan')
+    
+    print()
+    print(f"{'Decoder':10} {'Seconds':>10} {'Frames':>10} {'Speed-up':>10}")
+    print(f"{'opencv':10} {opencv_seconds:10.2f} {len(opencv_frames):10,} {'1.0x':>10}")
+    print(f"{'ffmpeg':10} {ffmpeg_seconds:10.2f} {len(ffmpeg_frames):10,} {opencv_seconds / ffmpeg_seconds:9.1f}x")
+    print(f"{'✅' if same_frames else '❌'} Same frame numbers: {same_frames}; "
+          f"mean pixel difference {difference:.2f} (of 255)")
+    
+    if not args.skip_scores:
+        if get_detector().is_demo:
+            print("⚠️ Demo mode (simulated detection) - scores can't be compared")
+        else:
+            print()
+            print("🎯 Scoring the video with each decoder...")
+            with tempfile.TemporaryDirectory() as scratch_dir:
+                opencv_scores = score_video('opencv', args.video, args.window_stride, args.max_frames, scratch_dir)
+                ffmpeg_scores = score_video('ffmpeg', args.video, args.window_stride, args.max_frames, scratch_dir)
+            
+            scored = np.isfinite(opencv_scores) & np.isfinite(ffmpeg_scores)
+            delta = np.abs(opencv_scores[scored] - ffmpeg_scores[scored])
+            opencv_incidents = int((opencv_scores > args.threshold).sum())
+            ffmpeg_incidents = int((ffmpeg_scores > args.threshold).sum())
+            flipped = int(((opencv_scores > args.threshold) != (ffmpeg_scores > args.threshold)).sum())
+            print(f"   Windows compared: {int(scored.sum()):,}")
+            if scored.any():
+                print(f"   |Δconfidence|: max {delta.max():.4f}, mean {delta.mean():.4f}")
+            print(f"   Incidents at {args.threshold:.0%}: opencv {opencv_incidents}, ffmpeg {ffmpeg_incidents} "
+                  f"(difference {ffmpeg_incidents - opencv_incidents:+d}, {flipped} windows flipped)")
+    return 0 if same_frames else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
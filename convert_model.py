@@ -0,0 +1,162 @@
+# Model Conversion Script
+# Converts the Keras .h5 model for the CPU backends (ONNX Runtime, TFLite, TFLite int8)
+# and checks their output against Keras.
+#
+#   python convert_model.py                              # convert to every backend
+#   python convert_model.py --backends onnx tflite-int8 --sample-videos uploads/user_1/*.mp4
+#   python convert_model.py --check-only --sample-videos uploads/user_1/clip.mp4
+#
+# Select the backend at runtime with MODEL_BACKEND=keras|onnx|tflite|tflite-int8
+
+import os
+import sys
+import time
+import argparse
+import numpy as np
+import cv2
+
+from detector import (
+    DEFAULT_MODEL_PATH, MODEL_BACKENDS, FrameRingBuffer,
+    backend_model_path, load_backend
+)
+from video_processing import iter_sampled_frames
+
+SEQUENCE_LENGTH = 16
+IMAGE_SIZE = (64, 64)
+
+def load_windows(video_paths, max_windows=64, window_stride=30):
+    """Read normalized (N, 16, 64, 64, 3) float32 windows from sample videos"""
+    windows = []
+    for video_path in video_paths:
+        cap = cv2.VideoCapture(video_path)
+        if not cap.isOpened():
+            print(f"⚠️  Could not open {video_path} - skipping")
+            continue
+        
+        frame_buffer = FrameRingBuffer(SEQUENCE_LENGTH, IMAGE_SIZE)
+        for frame_number, frame in iter_sampled_frames(cap, window_stride, SEQUENCE_LENGTH):
+            frame_buffer.push(frame)
+            if frame_number % window_stride == 0 and frame_buffer.is_full():
+                windows.append(frame_buffer.window())
+                if len(windows) >= max_windows:
+                    break
+        cap.release()
+        
+        if len(windows) >= max_windows:
+            break
+    
+    if not windows:
+        print("⚠️  No sample video windows - using random frames (parity numbers will be less meaningful)")
+        rng = np.random.default_rng(0)
+        return rng.random((max_windows, SEQUENCE_LENGTH, IMAGE_SIZE[1], IMAGE_SIZE[0], 3), dtype=np.float32)
+    
+    return np.stack(windows).astype(np.float32) / 255.0
+
+def convert_onnx(model, output_path):
+    """Export the Keras model to ONNX"""
+    import tensorflow as tf
+    import tf2onnx
+    
+    input_signature = [tf.TensorSpec((None, SEQUENCE_LENGTH, IMAGE_SIZE[1], IMAGE_SIZE[0], 3), tf.float32, name="frames")]
+    tf2onnx.convert.from_keras(model, input_signature=input_signature, opset=13, output_path=output_path)
+
+def convert_tflite(model, output_path, quantize_int8=False):
+    """Export the Keras model to TFLite, optionally with int8-quantized weights"""
+    import tensorflow as tf
+    
+    # A static batch-of-one input lets the converter fuse the BiLSTM into
+    # builtin TFLite LSTM ops; TFLiteBackend invokes it once per window
+    input_spec = tf.TensorSpec((1, SEQUENCE_LENGTH, IMAGE_SIZE[1], IMAGE_SIZE[0], 3), tf.float32)
+    concrete_function = tf.function(lambda frames: model(frames)).get_concrete_function(input_spec)
+    converter = tf.lite.TFLiteConverter.from_concrete_functions([concrete_function])
+    
+    if quantize_int8:
+        # Dynamic-range quantization: int8 weights, activations quantized on
+        # the fly by the int8 kernels. Needs no calibration data.
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    
+    tflite_model = converter.convert()
+    with open(output_path, "wb") as f:
+        f.write(tflite_model)
+
+def check_parity(model_path, backends, windows, threshold=0.8):
+    """Compare each backend's violence scores and throughput against Keras"""
+    reference_backend = load_backend(model_path, 'keras')
+    reference_backend.predict(windows[:1])
+    started = time.perf_counter()
+    reference = reference_backend.predict(windows)[:, 1]
+    reference_rate = len(windows) / (time.perf_counter() - started)
+    
+    print(f"{'Backend':12} {'Max |Δ|':>9} {'Mean |Δ|':>9} {'Agree@' + str(threshold):>10} {'Windows/s':>10}")
+    print(f"{'keras':12} {0.0:9.4f} {0.0:9.4f} {1.0:10.1%} {reference_rate:10.1f}")
+    
+    all_ok = True
+    for backend in backends:
+        if backend == 'keras':
+            continue
+        
+        path = backend_model_path(model_path, backend)
+        if not os.path.exists(path):
+            print(f"{backend:12} not converted ({path} missing)")
+            all_ok = False
+            continue
+        
+        try:
+            runner = load_backend(path, backend)
+            runner.predict(windows[:1])
+            started = time.perf_counter()
+            scores = runner.predict(windows)[:, 1]
+            rate = len(windows) / (time.perf_counter() - started)
+        except Exception as e:
+            print(f"{backend:12} ❌ {e}")
+            all_ok = False
+            continue
+        
+        delta = np.abs(scores - reference)
+        agreement = np.mean((scores > threshold) == (reference > threshold))
+        print(f"{backend:12} {delta.max():9.4f} {delta.mean():9.4f} {agreement:10.1%} {rate:10.1f}")
+    
+    return all_ok
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert the violence detection model for CPU backends")
+    parser.add_argument("--model", default=DEFAULT_MODEL_PATH, help="Keras .h5 model to convert")
+    parser.add_argument("--backends", nargs="+", default=[b for b in MODEL_BACKENDS if b != 'keras'],
+                        choices=[b for b in MODEL_BACKENDS if b != 'keras'])
+    parser.add_argument("--sample-videos", nargs="*", default=[],
+                        help="Videos whose windows are used for the parity check")
+    parser.add_argument("--windows", type=int, default=64, help="Number of windows to check with")
+    parser.add_argument("--check-only", action="store_true", help="Skip conversion and only run the parity check")
+    args = parser.parse_args()
+    
+    print("🛡️ Violence Detection System - Model Conversion")
+    print("=" * 50)
+    
+    if not os.path.exists(args.model):
+        print(f"❌ Model file not found: {args.model}")
+        return 1
+    
+    if not args.check_only:
+        import tensorflow as tf
+        model = tf.keras.models.load_model(args.model, compile=False)
+        
+        for backend in args.backends:
+            output_path = backend_model_path(args.model, backend)
+            print(f"🔄 Converting to {backend} → {output_path}")
+            try:
+                if backend == 'onnx':
+                    convert_onnx(model, output_path)
+                else:
+                    convert_tflite(model, output_path, quantize_int8=(backend == 'tflite-int8'))
+                size_mb = os.path.getsize(output_path) / (1024 * 1024)
+                print(f"✅ {backend}: {size_mb:.1f} MB")
+            except Exception as e:
+                print(f"❌ {backend} conversion failed: {e}")
+        print()
+    
+    print("🔍 Parity check against Keras")
+    windows = load_windows(args.sample_videos, args.windows)
+    return 0 if check_parity(args.model, args.backends, windows) else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
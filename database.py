@@ -0,0 +1,912 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from contextlib import contextmanager
+
+from query_cache import QueryCache
+
+DATABASE_PATH = os.getenv("DATABASE_PATH", "violence_detection.db")
+BUSY_TIMEOUT_MS = int(os.getenv("DATABASE_BUSY_TIMEOUT_MS", "30000"))
+QUERY_CACHE_TTL = float(os.getenv("QUERY_CACHE_TTL", "30"))
+QUERY_CACHE_SIZE = int(os.getenv("QUERY_CACHE_SIZE", "256"))
+
+INCIDENT_STATUSES = ['new', 'reviewed', 'dismissed']
+
+# Connection pool: one long-lived connection per thread (and process)
+_local = threading.local()
+
+def get_connection():
+    """Get this thread's pooled connection, opening it in WAL mode on first use"""
+    conn = getattr(_local, 'conn', None)
+    if conn is None or _local.pid != os.getpid():
+        conn = sqlite3.connect(DATABASE_PATH, timeout=BUSY_TIMEOUT_MS / 1000)
+        # WAL lets dashboard reads run while an analysis is writing;
+        # NORMAL sync only fsyncs at checkpoints instead of every commit
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute(f'PRAGMA busy_timeout={BUSY_TIMEOUT_MS}')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        _local.conn = conn
+        _local.pid = os.getpid()
+    return conn
+
+@contextmanager
+def transaction():
+    """Cursor whose statements commit together, or roll back on error"""
+    conn = get_connection()
+    with conn:
+        yield conn.cursor()
+
+def close_connection():
+    """Close this thread's pooled connection"""
+    conn = getattr(_local, 'conn', None)
+    if conn is not None:
+        conn.close()
+        _local.conn = None
+
+# Schema migrations
+def _create_base_tables(cursor):
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS users (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        username TEXT UNIQUE NOT NULL,
+        email TEXT UNIQUE NOT NULL,
+        password_hash TEXT NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        last_login TIMESTAMP
+    )
+    ''')
+    
+    # Very old databases were created before users.last_login existed
+    if 'last_login' not in _table_columns(cursor, 'users'):
+        cursor.execute('ALTER TABLE users ADD COLUMN last_login TIMESTAMP')
+    
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS videos (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER,
+        filename TEXT NOT NULL,
+        file_path TEXT NOT NULL,
+        upload_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        analysis_status TEXT DEFAULT 'pending',
+        analysis_completed_at TIMESTAMP,
+        total_incidents INTEGER DEFAULT 0,
+        FOREIGN KEY (user_id) REFERENCES users (id)
+    )
+    ''')
+    
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS incidents (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        video_id INTEGER,
+        user_id INTEGER,
+        timestamp_in_video REAL,
+        confidence_score REAL,
+        frame_number INTEGER,
+        screenshot_path TEXT,
+        detected_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        status TEXT DEFAULT 'new',
+        FOREIGN KEY (video_id) REFERENCES videos (id),
+        FOREIGN KEY (user_id) REFERENCES users (id)
+    )
+    ''')
+    
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS user_settings (
+        user_id INTEGER PRIMARY KEY,
+        email_notifications BOOLEAN DEFAULT 1,
+        confidence_threshold REAL DEFAULT 0.8,
+        notification_email TEXT,
+        FOREIGN KEY (user_id) REFERENCES users (id)
+    )
+    ''')
+
+def _add_analysis_job_columns(cursor):
+    # Databases from before versioning may already have some of these
+    video_columns = _table_columns(cursor, 'videos')
+    for column, definition in [
+        ('analysis_progress', 'REAL DEFAULT 0'),
+        ('analysis_message', 'TEXT'),
+        ('windows_analyzed', 'INTEGER DEFAULT 0'),
+        ('windows_skipped', 'INTEGER DEFAULT 0')
+    ]:
+        if column not in video_columns:
+            cursor.execute(f'ALTER TABLE videos ADD COLUMN {column} {definition}')
+
+def _add_dashboard_indexes(cursor):
+    # get_user_videos
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_videos_user_upload ON videos (user_id, upload_time)')
+    # get_video_incidents: covers every selected column, already in timestamp order
+    cursor.execute('''
+    CREATE INDEX IF NOT EXISTS idx_incidents_video_time ON incidents
+    (video_id, timestamp_in_video, confidence_score, frame_number, screenshot_path, detected_at)
+    ''')
+    # Per-user incident counts and the last-7-days chart
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_incidents_user_detected ON incidents (user_id, detected_at)')
+    cursor.execute('ANALYZE')
+
+def _create_daily_stats(cursor):
+    # Per-user, per-day (UTC) counts kept up to date by the video/incident writers
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS user_daily_stats (
+        user_id INTEGER NOT NULL,
+        day TEXT NOT NULL,
+        videos INTEGER DEFAULT 0,
+        incidents INTEGER DEFAULT 0,
+        max_confidence REAL,
+        confidence_sum REAL DEFAULT 0,
+        PRIMARY KEY (user_id, day)
+    ) WITHOUT ROWID
+    ''')
+    _rebuild_daily_stats(cursor)
+
+def _add_explorer_indexes(cursor):
+    # search_incidents filtered to one video, newest first
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_incidents_video_detected ON incidents (video_id, detected_at)')
+
+def _create_notification_outbox(cursor):
+    # Alerts waiting for (or done with) delivery by the background sender
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS notification_outbox (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER NOT NULL,
+        video_id INTEGER,
+        idempotency_key TEXT UNIQUE NOT NULL,
+        payload TEXT NOT NULL,
+        status TEXT DEFAULT 'pending',
+        attempts INTEGER DEFAULT 0,
+        next_attempt_at REAL NOT NULL,
+        last_error TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        sent_at TIMESTAMP,
+        FOREIGN KEY (user_id) REFERENCES users (id),
+        FOREIGN KEY (video_id) REFERENCES videos (id)
+    )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_outbox_due ON notification_outbox (status, next_attempt_at)')
+
+def _add_notification_digests(cursor):
+    # Outbox rows delivered together share the digest_id of the digest's first row
+    if 'digest_id' not in _table_columns(cursor, 'notification_outbox'):
+        cursor.execute('ALTER TABLE notification_outbox ADD COLUMN digest_id INTEGER')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_outbox_user_status ON notification_outbox (user_id, status)')
+
+def _add_alert_latency_columns(cursor):
+    # Seconds from upload (or frame capture, for live streams) to the first alert being queued/delivered
+    video_columns = _table_columns(cursor, 'videos')
+    for column in ('time_to_detect', 'time_to_alert'):
+        if column not in video_columns:
+            cursor.execute(f'ALTER TABLE videos ADD COLUMN {column} REAL')
+
+def _add_score_timeline_columns(cursor):
+    # Where a video's per-window scores are stored and how to map them back to frames
+    video_columns = _table_columns(cursor, 'videos')
+    for column, definition in [
+        ('timeline_path', 'TEXT'),
+        ('window_stride', 'INTEGER'),
+        ('fps', 'REAL'),
+        ('confidence_threshold', 'REAL')
+    ]:
+        if column not in video_columns:
+            cursor.execute(f'ALTER TABLE videos ADD COLUMN {column} {definition}')
+
+def _create_analysis_cache(cursor):
+    # Uploads are content-addressed; a completed analysis is reused for identical content and settings
+    if 'content_hash' not in _table_columns(cursor, 'videos'):
+        cursor.execute('ALTER TABLE videos ADD COLUMN content_hash TEXT')
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS analysis_cache (
+        cache_key TEXT PRIMARY KEY,
+        video_id INTEGER NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (video_id) REFERENCES videos (id)
+    )
+    ''')
+
+def _create_analysis_checkpoints(cursor):
+    # Re-running an interrupted analysis may find the same windows again; one incident per video frame
+    cursor.execute('''
+    DELETE FROM incidents WHERE id NOT IN (SELECT MIN(id) FROM incidents GROUP BY video_id, frame_number)
+    ''')
+    if cursor.rowcount:
+        _rebuild_daily_stats(cursor)
+    cursor.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_incidents_video_frame ON incidents (video_id, frame_number)')
+    # Progress of each running segment (keyed by its start frame) of an analysis
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS analysis_checkpoints (
+        video_id INTEGER NOT NULL,
+        start_frame INTEGER NOT NULL,
+        frame_number INTEGER NOT NULL,
+        windows_analyzed INTEGER DEFAULT 0,
+        windows_skipped INTEGER DEFAULT 0,
+        incidents INTEGER DEFAULT 0,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (video_id, start_frame),
+        FOREIGN KEY (video_id) REFERENCES videos (id)
+    ) WITHOUT ROWID
+    ''')
+
+def _add_video_source_column(cursor):
+    # 'file' for uploaded videos, 'live' for camera/stream monitoring
+    if 'source' not in _table_columns(cursor, 'videos'):
+        cursor.execute("ALTER TABLE videos ADD COLUMN source TEXT DEFAULT 'file'")
+    # Streams so far are the rows whose path is a URL or a device index
+    cursor.execute('''
+    UPDATE videos SET source = 'live' WHERE file_path LIKE '%://%' OR file_path NOT GLOB '*[^0-9]*'
+    ''')
+
+def _create_cache_generations(cursor):
+    # Bumped by every write that changes a user's cached dashboard queries
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS cache_generations (
+        user_id INTEGER PRIMARY KEY,
+        generation INTEGER NOT NULL DEFAULT 0
+    )
+    ''')
+
+# Applied in order; PRAGMA user_version records the last version applied.
+# Append new migrations here instead of editing released ones.
+MIGRATIONS = [
+    (1, "Base tables", _create_base_tables),
+    (2, "Analysis job columns", _add_analysis_job_columns),
+    (3, "Dashboard indexes", _add_dashboard_indexes),
+    (4, "Daily statistics rollup", _create_daily_stats),
+    (5, "Query cache generations", _create_cache_generations),
+    (6, "Incident explorer indexes", _add_explorer_indexes),
+    (7, "Notification outbox", _create_notification_outbox),
+    (8, "Notification digests", _add_notification_digests),
+    (9, "Time-to-alert columns", _add_alert_latency_columns),
+    (10, "Score timeline columns", _add_score_timeline_columns),
+    (11, "Analysis result cache", _create_analysis_cache),
+    (12, "Analysis checkpoints", _create_analysis_checkpoints),
+    (13, "Video source column", _add_video_source_column)
+]
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+def _table_columns(cursor, table):
+    cursor.execute(f"PRAGMA table_info({table})")
+    return [column[1] for column in cursor.fetchall()]
+
+def get_schema_version():
+    """Schema version of the database file"""
+    return get_connection().execute('PRAGMA user_version').fetchone()[0]
+
+def migrate_database(target_version=None):
+    """Apply pending migrations up to target_version (default: latest); returns the new version"""
+    target_version = SCHEMA_VERSION if target_version is None else target_version
+    conn = get_connection()
+    cursor = conn.cursor()
+    
+    for version, description, migrate in MIGRATIONS:
+        if version > target_version:
+            break
+        
+        # IMMEDIATE takes the write lock up front, so concurrent workers
+        # starting together apply each migration exactly once
+        cursor.execute('BEGIN IMMEDIATE')
+        try:
+            if cursor.execute('PRAGMA user_version').fetchone()[0] < version:
+                migrate(cursor)
+                cursor.execute(f'PRAGMA user_version = {version}')
+                print(f"🗄️ Applied migration {version}: {description}")
+            cursor.execute('COMMIT')
+        except Exception:
+            cursor.execute('ROLLBACK')
+            raise
+    
+    return get_schema_version()
+
+def _rebuild_daily_stats(cursor, user_id=None):
+    user_filter = 'WHERE user_id = ?' if user_id is not None else ''
+    params = (user_id,) if user_id is not None else ()
+    
+    cursor.execute(f'DELETE FROM user_daily_stats {user_filter}', params)
+    cursor.execute(f'''
+    INSERT INTO user_daily_stats (user_id, day, videos)
+    SELECT user_id, DATE(upload_time), COUNT(*) FROM videos {user_filter}
+    GROUP BY user_id, DATE(upload_time)
+    ''', params)
+    cursor.execute(f'''
+    INSERT INTO user_daily_stats (user_id, day, incidents, max_confidence, confidence_sum)
+    SELECT user_id, DATE(detected_at), COUNT(*), MAX(confidence_score), SUM(confidence_score)
+    FROM incidents {user_filter}
+    GROUP BY user_id, DATE(detected_at)
+    ON CONFLICT (user_id, day) DO UPDATE SET
+        incidents = excluded.incidents,
+        max_confidence = excluded.max_confidence,
+        confidence_sum = excluded.confidence_sum
+    ''', params)
+
+def rebuild_daily_stats(user_id=None):
+    """Recompute the daily statistics rollup from videos/incidents (one user, or everyone)"""
+    with transaction() as cursor:
+        _rebuild_daily_stats(cursor, user_id)
+        if user_id is not None:
+            _bump_generation(cursor, user_id)
+        else:
+            cursor.execute('''
+            INSERT INTO cache_generations (user_id, generation) SELECT id, 1 FROM users WHERE true
+            ON CONFLICT (user_id) DO UPDATE SET generation = generation + 1
+            ''')
+    query_cache.clear()
+
+# Query cache
+# Results of the dashboard reads are cached per user. Writers bump the
+# user's generation in the same transaction, so a cached result is never
+# served after a write, even one made by an analysis worker process.
+query_cache = QueryCache(QUERY_CACHE_SIZE, QUERY_CACHE_TTL)
+
+def _bump_generation(cursor, user_id):
+    cursor.execute('''
+    INSERT INTO cache_generations (user_id, generation) VALUES (?, 1)
+    ON CONFLICT (user_id) DO UPDATE SET generation = generation + 1
+    ''', (user_id,))
+
+def _bump_video_generation(cursor, video_id):
+    cursor.execute('''
+    INSERT INTO cache_generations (user_id, generation)
+    SELECT user_id, 1 FROM videos WHERE id = ? AND user_id IS NOT NULL
+    ON CONFLICT (user_id) DO UPDATE SET generation = generation + 1
+    ''', (video_id,))
+
+def _user_generation(user_id):
+    row = get_connection().execute('SELECT generation FROM cache_generations WHERE user_id = ?', (user_id,)).fetchone()
+    return row[0] if row else 0
+
+def _cached_query(user_id, generation, key, load):
+    key = (user_id,) + key
+    result = query_cache.get(key, generation)
+    if result is None:
+        result = load()
+        query_cache.set(key, generation, result)
+    return result
+
+def init_database():
+    """Initialize SQLite database"""
+    migrate_database()
+
+# Database Functions
+def save_user(username, email, password):
+    """Save new user to database"""
+    password_hash = hashlib.sha256(password.encode()).hexdigest()
+    
+    try:
+        with transaction() as cursor:
+            cursor.execute('''
+            INSERT INTO users (username, email, password_hash)
+            VALUES (?, ?, ?)
+            ''', (username, email, password_hash))
+            
+            user_id = cursor.lastrowid
+            cursor.execute('''
+            INSERT INTO user_settings (user_id, notification_email)
+            VALUES (?, ?)
+            ''', (user_id, email))
+        return True, "Account created successfully!"
+    except sqlite3.IntegrityError:
+        return False, "Username or email already exists"
+
+def authenticate_user(username, password):
+    """Authenticate user login"""
+    password_hash = hashlib.sha256(password.encode()).hexdigest()
+    
+    with transaction() as cursor:
+        cursor.execute('''
+        SELECT id, username, email FROM users 
+        WHERE username = ? AND password_hash = ?
+        ''', (username, password_hash))
+        
+        user = cursor.fetchone()
+        
+        if user:
+            cursor.execute('UPDATE users SET last_login = CURRENT_TIMESTAMP WHERE id = ?', (user[0],))
+    
+    return user
+
+def get_user_settings(user_id):
+    """Get (email_notifications, confidence_threshold, notification_email) for a user"""
+    return get_connection().execute('''
+    SELECT email_notifications, confidence_threshold, notification_email
+    FROM user_settings WHERE user_id = ?
+    ''', (user_id,)).fetchone()
+
+def save_user_settings(user_id, email_notifications, confidence_threshold, notification_email):
+    """Update a user's settings"""
+    with transaction() as cursor:
+        cursor.execute('''
+        UPDATE user_settings 
+        SET email_notifications = ?, confidence_threshold = ?, notification_email = ?
+        WHERE user_id = ?
+        ''', (email_notifications, confidence_threshold, notification_email, user_id))
+
+def get_notification_settings(user_id):
+    """Get (email_notifications, notification_email, username) for alert emails"""
+    return get_connection().execute('''
+    SELECT us.email_notifications, us.notification_email, u.username
+    FROM user_settings us JOIN users u ON us.user_id = u.id
+    WHERE us.user_id = ?
+    ''', (user_id,)).fetchone()
+
+def enqueue_notification(user_id, video_id, idempotency_key, payload, delay=0.0):
+    """Add an alert to the outbox, due after delay seconds; returns False if one with this key was already queued"""
+    with transaction() as cursor:
+        cursor.execute('''
+        INSERT OR IGNORE INTO notification_outbox (user_id, video_id, idempotency_key, payload, next_attempt_at)
+        VALUES (?, ?, ?, ?, ?)
+        ''', (user_id, video_id, idempotency_key, json.dumps(payload), time.time() + delay))
+        return cursor.rowcount == 1
+
+def claim_due_notifications(limit=10):
+    """Atomically move outbox rows to 'sending' for up to limit users with a due alert
+    
+    Pending rows of those users that aren't in a digest yet are claimed
+    too, due or not, so they can be coalesced into one digest. A digest
+    being retried is only claimed once its backoff is over. Returns (id,
+    user_id, video_id, digest_id, payload, attempts) tuples.
+    """
+    now = time.time()
+    with transaction() as cursor:
+        cursor.execute('''
+        UPDATE notification_outbox SET status = 'sending', attempts = attempts + 1
+        WHERE status = 'pending' AND (digest_id IS NULL OR next_attempt_at <= ?) AND user_id IN (
+            SELECT DISTINCT user_id FROM notification_outbox
+            WHERE status = 'pending' AND next_attempt_at <= ?
+            LIMIT ?
+        )
+        RETURNING id, user_id, video_id, digest_id, payload, attempts
+        ''', (now, now, limit))
+        rows = cursor.fetchall()
+    return sorted(row[:4] + (json.loads(row[4]), row[5]) for row in rows)
+
+def assign_notification_digest(notification_ids, digest_id):
+    """Record that these outbox rows are delivered together as one digest email"""
+    with transaction() as cursor:
+        cursor.executemany('UPDATE notification_outbox SET digest_id = ? WHERE id = ?',
+                           [(digest_id, notification_id) for notification_id in notification_ids])
+
+def finish_notifications(notification_ids, status, error=None):
+    """Record a final outbox state for rows: 'sent', 'failed' or 'skipped'"""
+    with transaction() as cursor:
+        cursor.executemany('''
+        UPDATE notification_outbox SET status = ?, last_error = ?,
+        sent_at = CASE WHEN ? = 'sent' THEN CURRENT_TIMESTAMP END
+        WHERE id = ?
+        ''', [(status, error, status, notification_id) for notification_id in notification_ids])
+
+def retry_notifications(notification_ids, error, delay):
+    """Put outbox rows back to 'pending' after a failed attempt"""
+    with transaction() as cursor:
+        cursor.executemany('''
+        UPDATE notification_outbox SET status = 'pending', last_error = ?, next_attempt_at = ?
+        WHERE id = ?
+        ''', [(error, time.time() + delay, notification_id) for notification_id in notification_ids])
+
+def get_notification_stats(user_id=None):
+    """Alerts delivered, emails actually sent for them, and the sends saved by coalescing"""
+    user_filter = 'AND user_id = ?' if user_id is not None else ''
+    params = (user_id,) if user_id is not None else ()
+    alerts, emails = get_connection().execute(f'''
+    SELECT COUNT(*), COUNT(DISTINCT COALESCE(digest_id, id))
+    FROM notification_outbox WHERE status = 'sent' {user_filter}
+    ''', params).fetchone()
+    return {'alerts': alerts, 'emails': emails, 'sends_saved': alerts - emails}
+
+def requeue_interrupted_notifications():
+    """Return rows left in 'sending' by a crashed sender to the queue"""
+    with transaction() as cursor:
+        cursor.execute("UPDATE notification_outbox SET status = 'pending' WHERE status = 'sending'")
+        return cursor.rowcount
+
+def save_video_to_db(user_id, filename, file_path, analysis_status='pending', content_hash=None, source='file'):
+    """Save video info to database; source is 'file' or 'live'"""
+    with transaction() as cursor:
+        cursor.execute('INSERT INTO videos (user_id, filename, file_path, analysis_status, content_hash, source) VALUES (?, ?, ?, ?, ?, ?)', 
+                       (user_id, filename, file_path, analysis_status, content_hash, source))
+        video_id = cursor.lastrowid
+        cursor.execute('''
+        INSERT INTO user_daily_stats (user_id, day, videos)
+        SELECT user_id, DATE(upload_time), 1 FROM videos WHERE id = ?
+        ON CONFLICT (user_id, day) DO UPDATE SET videos = videos + 1
+        ''', (video_id,))
+        _bump_generation(cursor, user_id)
+    query_cache.invalidate_user(user_id)
+    return video_id
+
+def save_incident_to_db(video_id, user_id, timestamp, confidence, frame_number, screenshot_path, detected_at=None):
+    """Save incident to database"""
+    save_incidents_to_db(video_id, user_id, [{
+        'timestamp_seconds': timestamp,
+        'confidence': confidence,
+        'frame_number': frame_number,
+        'screenshot_path': screenshot_path,
+        'detected_at': detected_at
+    }])
+
+def save_incidents_to_db(video_id, user_id, incidents):
+    """Save several incident dicts in one transaction; incidents already saved for a frame are skipped"""
+    if not incidents:
+        return
+    
+    rows = [
+        (video_id, user_id, incident['timestamp_seconds'], float(incident['confidence']),
+         incident['frame_number'], incident['screenshot_path'], incident.get('detected_at'))
+        for incident in incidents
+    ]
+    
+    with transaction() as cursor:
+        # A resumed analysis repeats the windows after its last checkpoint
+        inserted = []
+        for row in rows:
+            cursor.execute('''
+            INSERT INTO incidents (video_id, user_id, timestamp_in_video, confidence_score, frame_number, screenshot_path, detected_at)
+            VALUES (?, ?, ?, ?, ?, ?, COALESCE(?, CURRENT_TIMESTAMP))
+            ON CONFLICT (video_id, frame_number) DO NOTHING
+            ''', row)
+            if cursor.rowcount:
+                inserted.append(row)
+        
+        # Keep the daily rollup in step within the same transaction
+        cursor.executemany('''
+        INSERT INTO user_daily_stats (user_id, day, incidents, max_confidence, confidence_sum)
+        VALUES (?, DATE(COALESCE(?, CURRENT_TIMESTAMP)), 1, ?, ?)
+        ON CONFLICT (user_id, day) DO UPDATE SET
+            incidents = incidents + 1,
+            max_confidence = MAX(COALESCE(max_confidence, 0), excluded.max_confidence),
+            confidence_sum = confidence_sum + excluded.confidence_sum
+        ''', [(row[1], row[6], row[3], row[3]) for row in inserted])
+        _bump_generation(cursor, user_id)
+    query_cache.invalidate_user(user_id)
+
+class IncidentWriter:
+    """Buffers incidents and writes them in batched transactions"""
+    
+    def __init__(self, video_id, user_id, batch_size=50, max_wait=5.0):
+        self.video_id = video_id
+        self.user_id = user_id
+        self.batch_size = batch_size
+        self.max_wait = max_wait
+        self.pending = []
+        self.last_flush = time.monotonic()
+    
+    def add(self, incident):
+        self.pending.append(incident)
+        if len(self.pending) >= self.batch_size or time.monotonic() - self.last_flush >= self.max_wait:
+            self.flush()
+    
+    def flush(self):
+        save_incidents_to_db(self.video_id, self.user_id, self.pending)
+        self.pending = []
+        self.last_flush = time.monotonic()
+
+def update_video_analysis_status(video_id, incident_count, windows_analyzed=None, windows_skipped=None):
+    """Update video analysis status"""
+    with transaction() as cursor:
+        cursor.execute('''
+        UPDATE videos SET analysis_status = 'completed', 
+        analysis_completed_at = CURRENT_TIMESTAMP, total_incidents = ?,
+        analysis_progress = 1,
+        windows_analyzed = COALESCE(?, windows_analyzed),
+        windows_skipped = COALESCE(?, windows_skipped)
+        WHERE id = ?
+        ''', (incident_count, windows_analyzed, windows_skipped, video_id))
+        _bump_video_generation(cursor, video_id)
+
+def claim_video_for_analysis(video_id):
+    """Move a pending video to 'running'; returns False if another worker owns it"""
+    with transaction() as cursor:
+        cursor.execute('''
+        UPDATE videos SET analysis_status = 'running', analysis_progress = 0, analysis_message = NULL
+        WHERE id = ? AND analysis_status = 'pending'
+        ''', (video_id,))
+        claimed = cursor.rowcount == 1
+        if claimed:
+            _bump_video_generation(cursor, video_id)
+        return claimed
+
+def update_video_progress(video_id, progress=None, message=None):
+    """Record analysis progress and/or status message for a running video"""
+    with transaction() as cursor:
+        cursor.execute('''
+        UPDATE videos SET analysis_progress = COALESCE(?, analysis_progress),
+        analysis_message = COALESCE(?, analysis_message)
+        WHERE id = ?
+        ''', (progress, message, video_id))
+
+def mark_video_failed(video_id, message):
+    """Mark a video analysis as failed"""
+    with transaction() as cursor:
+        cursor.execute('''
+        UPDATE videos SET analysis_status = 'failed', analysis_message = ?,
+        analysis_completed_at = CURRENT_TIMESTAMP
+        WHERE id = ?
+        ''', (message, video_id))
+        _bump_video_generation(cursor, video_id)
+
+def record_score_timeline(video_id, timeline_path, window_stride, fps, confidence_threshold):
+    """Store where a video's score timeline is and the threshold its incidents were derived at"""
+    with transaction() as cursor:
+        cursor.execute('''
+        UPDATE videos SET timeline_path = ?, window_stride = ?, fps = ?, confidence_threshold = ?
+        WHERE id = ?
+        ''', (timeline_path, window_stride, fps, confidence_threshold, video_id))
+
+def replace_video_incidents(video_id, user_id, incidents, confidence_threshold):
+    """Swap a video's incidents for ones re-derived at a new threshold
+    
+    Incidents that survive keep their review status and detected_at; new
+    ones are dated when the video was analysed (now, if it hasn't been).
+    """
+    with transaction() as cursor:
+        cursor.execute('SELECT frame_number, status, detected_at FROM incidents WHERE video_id = ?', (video_id,))
+        existing = {frame_number: (status, detected_at) for frame_number, status, detected_at in cursor.fetchall()}
+        cursor.execute('SELECT analysis_completed_at FROM videos WHERE id = ?', (video_id,))
+        analysed_at = cursor.fetchone()[0]
+        rows = [
+            (video_id, user_id, incident['timestamp_seconds'], float(incident['confidence']),
+             incident['frame_number'], incident['screenshot_path'],
+             *existing.get(incident['frame_number'], ('new', analysed_at)))
+            for incident in incidents
+        ]
+        
+        cursor.execute('DELETE FROM incidents WHERE video_id = ?', (video_id,))
+        cursor.executemany('''
+        INSERT INTO incidents
+        (video_id, user_id, timestamp_in_video, confidence_score, frame_number, screenshot_path, status, detected_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, COALESCE(?, CURRENT_TIMESTAMP))
+        ''', rows)
+        cursor.execute('UPDATE videos SET total_incidents = ?, confidence_threshold = ? WHERE id = ?',
+                       (len(rows), confidence_threshold, video_id))
+        # Removed incidents can be on any day, so recount this user's rollup
+        _rebuild_daily_stats(cursor, user_id)
+        _bump_generation(cursor, user_id)
+    query_cache.invalidate_user(user_id)
+
+def save_analysis_cache(cache_key, video_id):
+    """Remember a completed analysis as the result for its content and settings"""
+    with transaction() as cursor:
+        cursor.execute('''
+        INSERT INTO analysis_cache (cache_key, video_id) VALUES (?, ?)
+        ON CONFLICT (cache_key) DO UPDATE SET video_id = excluded.video_id, created_at = CURRENT_TIMESTAMP
+        ''', (cache_key, video_id))
+
+def get_analysis_cache(cache_key):
+    """Id of the completed video analysed under cache_key, or None"""
+    row = get_connection().execute('''
+    SELECT c.video_id FROM analysis_cache c JOIN videos v ON v.id = c.video_id
+    WHERE c.cache_key = ? AND v.analysis_status = 'completed' AND v.timeline_path IS NOT NULL
+    ''', (cache_key,)).fetchone()
+    return row[0] if row else None
+
+def save_analysis_checkpoint(video_id, start_frame, frame_number, windows_analyzed, windows_skipped, incidents):
+    """Record that a segment's windows up to frame_number are scored and their incidents saved"""
+    with transaction() as cursor:
+        cursor.execute('''
+        INSERT INTO analysis_checkpoints
+        (video_id, start_frame, frame_number, windows_analyzed, windows_skipped, incidents)
+        VALUES (?, ?, ?, ?, ?, ?)
+        ON CONFLICT (video_id, start_frame) DO UPDATE SET
+            frame_number = excluded.frame_number,
+            windows_analyzed = excluded.windows_analyzed,
+            windows_skipped = excluded.windows_skipped,
+            incidents = excluded.incidents,
+            updated_at = CURRENT_TIMESTAMP
+        ''', (video_id, start_frame, frame_number, windows_analyzed, windows_skipped, incidents))
+
+def get_analysis_checkpoints(video_id):
+    """A video's checkpoints by segment start frame"""
+    rows = get_connection().execute('''
+    SELECT start_frame, frame_number, windows_analyzed, windows_skipped, incidents
+    FROM analysis_checkpoints WHERE video_id = ?
+    ''', (video_id,)).fetchall()
+    return {
+        row[0]: {'frame_number': row[1], 'windows_analyzed': row[2], 'windows_skipped': row[3], 'incidents': row[4]}
+        for row in rows
+    }
+
+def clear_analysis_checkpoints(video_id):
+    with transaction() as cursor:
+        cursor.execute('DELETE FROM analysis_checkpoints WHERE video_id = ?', (video_id,))
+
+def requeue_interrupted_videos():
+    """Clean up videos left 'running' by a stopped process; returns how many analyses were requeued
+    
+    File analyses go back to 'pending' and resume from their checkpoints.
+    Live streams died with the process, so they are completed with the
+    incidents they recorded. Call once at start-up, before any stream starts.
+    """
+    with transaction() as cursor:
+        cursor.execute('''
+        INSERT INTO cache_generations (user_id, generation)
+        SELECT DISTINCT user_id, 1 FROM videos
+        WHERE analysis_status = 'running' AND user_id IS NOT NULL
+        ON CONFLICT (user_id) DO UPDATE SET generation = generation + 1
+        ''')
+        cursor.execute('''
+        UPDATE videos SET analysis_status = 'completed', analysis_completed_at = CURRENT_TIMESTAMP,
+        analysis_message = '⏹️ Stream stopped by a restart',
+        total_incidents = (SELECT COUNT(*) FROM incidents WHERE incidents.video_id = videos.id)
+        WHERE analysis_status = 'running' AND source = 'live'
+        ''')
+        cursor.execute('''
+        UPDATE videos SET analysis_status = 'pending'
+        WHERE analysis_status = 'running' AND source = 'file'
+        ''')
+        return cursor.rowcount
+
+def record_time_to_detect(video_id, seconds):
+    """Store how long the video's first alert took to be queued (first call wins)"""
+    with transaction() as cursor:
+        cursor.execute('UPDATE videos SET time_to_detect = ? WHERE id = ? AND time_to_detect IS NULL',
+                       (seconds, video_id))
+
+def record_time_to_alert(latencies):
+    """Store (video_id, seconds) from upload/capture to first alert delivery (first call wins)"""
+    with transaction() as cursor:
+        cursor.executemany('UPDATE videos SET time_to_alert = ? WHERE id = ? AND time_to_alert IS NULL',
+                           [(seconds, video_id) for video_id, seconds in latencies])
+
+def get_time_to_alert_stats(user_id, days=7):
+    """Median and 95th percentile time-to-alert over a user's recent videos"""
+    rows = get_connection().execute('''
+    SELECT time_to_alert FROM videos
+    WHERE user_id = ? AND upload_time >= DATETIME("now", ?) AND time_to_alert IS NOT NULL
+    ORDER BY time_to_alert
+    ''', (user_id, f"-{int(days)} days")).fetchall()
+    
+    if not rows:
+        return None
+    
+    latencies = [row[0] for row in rows]
+    return {
+        'videos': len(latencies),
+        'median': latencies[len(latencies) // 2],
+        'p95': latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+    }
+
+def get_video_job(video_id):
+    """Get a video's analysis job state"""
+    row = get_connection().execute('''
+    SELECT id, user_id, filename, file_path, analysis_status, analysis_progress,
+    analysis_message, total_incidents, windows_analyzed, windows_skipped,
+    CAST(strftime('%s', upload_time) AS REAL), time_to_detect, time_to_alert,
+    timeline_path, window_stride, fps, confidence_threshold, content_hash
+    FROM videos WHERE id = ?
+    ''', (video_id,)).fetchone()
+    
+    if not row:
+        return None
+    
+    return {
+        'id': row[0],
+        'user_id': row[1],
+        'filename': row[2],
+        'file_path': row[3],
+        'status': row[4],
+        'progress': row[5] or 0.0,
+        'message': row[6],
+        'total_incidents': row[7],
+        'windows_analyzed': row[8] or 0,
+        'windows_skipped': row[9] or 0,
+        'uploaded_at': row[10],
+        'time_to_detect': row[11],
+        'time_to_alert': row[12],
+        'timeline_path': row[13],
+        'window_stride': row[14],
+        'fps': row[15],
+        'confidence_threshold': row[16],
+        'content_hash': row[17]
+    }
+
+def get_pending_video_ids():
+    """Get ids of videos waiting for analysis, oldest first"""
+    rows = get_connection().execute("SELECT id FROM videos WHERE analysis_status = 'pending' ORDER BY id").fetchall()
+    return [row[0] for row in rows]
+
+def get_user_videos(user_id, limit=None, after=None):
+    """Get user's videos, newest first (cached)
+    
+    Pass limit for one page, and the (upload_time, id) of the previous
+    page's last row as after to get the next one (keyset pagination).
+    """
+    def load():
+        keyset = 'AND (upload_time, id) < (?, ?)' if after else ''
+        params = (user_id,) + tuple(after or ()) + ((limit,) if limit else ())
+        return get_connection().execute(f'''
+        SELECT id, filename, upload_time, analysis_status, total_incidents
+        FROM videos WHERE user_id = ? {keyset}
+        ORDER BY upload_time DESC, id DESC {'LIMIT ?' if limit else ''}
+        ''', params).fetchall()
+    
+    return _cached_query(user_id, _user_generation(user_id), ('videos', limit, after), load)
+
+def search_incidents(user_id, limit=50, after=None, start_date=None, end_date=None,
+                     min_confidence=None, max_confidence=None, status=None, video_id=None):
+    """One page of a user's incidents matching the filters, newest first (cached)
+    
+    Rows are (id, video_id, filename, timestamp_in_video, confidence_score,
+    frame_number, screenshot_path, detected_at, status). after is the
+    (detected_at, id) of the previous page's last row. Dates are inclusive
+    YYYY-MM-DD strings.
+    """
+    conditions = ['i.user_id = ?']
+    params = [user_id]
+    for condition, value in [
+        ('i.video_id = ?', video_id),
+        ('i.detected_at >= ?', start_date),
+        ('i.detected_at < DATE(?, "+1 day")', end_date),
+        ('i.confidence_score >= ?', min_confidence),
+        ('i.confidence_score <= ?', max_confidence),
+        ('i.status = ?', status)
+    ]:
+        if value is not None:
+            conditions.append(condition)
+            params.append(value)
+    if after:
+        conditions.append('(i.detected_at, i.id) < (?, ?)')
+        params.extend(after)
+    params.append(limit)
+    
+    def load():
+        return get_connection().execute(f'''
+        SELECT i.id, i.video_id, v.filename, i.timestamp_in_video, i.confidence_score,
+        i.frame_number, i.screenshot_path, i.detected_at, i.status
+        FROM incidents i JOIN videos v ON v.id = i.video_id
+        WHERE {' AND '.join(conditions)}
+        ORDER BY i.detected_at DESC, i.id DESC LIMIT ?
+        ''', params).fetchall()
+    
+    key = ('search', limit, after, start_date, end_date, min_confidence, max_confidence, status, video_id)
+    return _cached_query(user_id, _user_generation(user_id), key, load)
+
+def update_incident_status(incident_id, user_id, status):
+    """Set an incident's review status"""
+    with transaction() as cursor:
+        cursor.execute('UPDATE incidents SET status = ? WHERE id = ? AND user_id = ?', (status, incident_id, user_id))
+        _bump_generation(cursor, user_id)
+    query_cache.invalidate_user(user_id)
+
+def get_video_incidents(video_id):
+    """Get incidents for a video (cached)"""
+    owner = get_connection().execute('''
+    SELECT v.user_id, COALESCE(g.generation, 0)
+    FROM videos v LEFT JOIN cache_generations g ON g.user_id = v.user_id
+    WHERE v.id = ?
+    ''', (video_id,)).fetchone()
+    if not owner:
+        return []
+    
+    return _cached_query(owner[0], owner[1], ('incidents', video_id), lambda: get_connection().execute('''
+    SELECT timestamp_in_video, confidence_score, frame_number, screenshot_path, detected_at
+    FROM incidents WHERE video_id = ? ORDER BY timestamp_in_video
+    ''', (video_id,)).fetchall())
+
+def get_user_statistics(user_id):
+    """Get user statistics from the daily rollup (cached)"""
+    return _cached_query(user_id, _user_generation(user_id), ('statistics',),
+                         lambda: _load_user_statistics(user_id))
+
+def _load_user_statistics(user_id):
+    cursor = get_connection().cursor()
+    
+    cursor.execute('''
+    SELECT COALESCE(SUM(videos), 0), COALESCE(SUM(incidents), 0),
+    COALESCE(SUM(CASE WHEN day = DATE("now") THEN videos END), 0)
+    FROM user_daily_stats WHERE user_id = ?
+    ''', (user_id,))
+    total_videos, total_incidents, videos_today = cursor.fetchone()
+    
+    cursor.execute('''
+    SELECT day, incidents, max_confidence, confidence_sum / incidents
+    FROM user_daily_stats WHERE user_id = ? AND day >= DATE("now", "-7 days") AND incidents > 0
+    ORDER BY day
+    ''', (user_id,))
+    daily_incidents = cursor.fetchall()
+    
+    return {
+        'total_videos': total_videos,
+        'total_incidents': total_incidents,
+        'videos_today': videos_today,
+        'daily_incidents': daily_incidents
+    }
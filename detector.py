@@ -0,0 +1,445 @@
+import os
+import time
+import hashlib
+import threading
+import cv2
+import numpy as np
+
+DEFAULT_MODEL_PATH = "models/best_mobilenet_bilstm.h5"
+MODEL_BACKEND = os.getenv("MODEL_BACKEND", "keras")
+# Default cut-off for is_violent; video analyses apply the user's confidence_threshold instead
+CONFIDENCE_THRESHOLD = 0.8
+
+# File suffix of the converted model each backend loads (see convert_model.py)
+MODEL_BACKENDS = {
+    'keras': '.h5',
+    'onnx': '.onnx',
+    'tflite': '.tflite',
+    'tflite-int8': '_int8.tflite'
+}
+
+# Inference backends
+class KerasBackend:
+    """Runs the original .h5 model with TensorFlow/Keras"""
+    
+    def __init__(self, model_path):
+        import tensorflow as tf
+        self.model = tf.keras.models.load_model(model_path, compile=False)
+    
+    def predict(self, input_batch):
+        return self.model.predict(input_batch, batch_size=len(input_batch), verbose=0)
+    
+    def split_stages(self):
+        """Split into a per-frame encoder and a temporal head, or None if the model can't be split
+        
+        Expects the TimeDistributed(frame encoder) -> BiLSTM -> Dense layout; the
+        split is only used if it reproduces the full model's output.
+        """
+        import tensorflow as tf
+        
+        layers = self.model.layers
+        split_index = next((index for index, layer in enumerate(layers)
+                            if isinstance(layer, tf.keras.layers.TimeDistributed)), None)
+        if split_index is None:
+            return None
+        
+        try:
+            encoder = layers[split_index].layer
+            head_input = tf.keras.Input(shape=tuple(layers[split_index].output.shape[1:]))
+            head_output = head_input
+            for layer in layers[split_index + 1:]:
+                head_output = layer(head_output)
+            head = tf.keras.Model(head_input, head_output)
+            
+            sample = np.random.default_rng(0).random(tuple(self.model.input_shape[1:]), dtype=np.float32)
+            expected = self.model.predict(sample[np.newaxis], verbose=0)
+            features = encoder.predict(sample, verbose=0)
+            actual = head.predict(features[np.newaxis], verbose=0)
+            if not np.allclose(expected, actual, atol=1e-4):
+                return None
+        except Exception as e:
+            print(f"⚠️ Could not split model into encoder/head stages: {e}")
+            return None
+        
+        return encoder, head
+
+class OnnxBackend:
+    """Runs an ONNX export of the model with ONNX Runtime on CPU"""
+    
+    def __init__(self, model_path):
+        import onnxruntime as ort
+        self.session = ort.InferenceSession(model_path, providers=["CPUExecutionProvider"])
+        self.input_name = self.session.get_inputs()[0].name
+    
+    def predict(self, input_batch):
+        return self.session.run(None, {self.input_name: input_batch})[0]
+
+class TFLiteBackend:
+    """Runs a TFLite export of the model, including int8-quantized ones"""
+    
+    def __init__(self, model_path):
+        try:
+            from tflite_runtime.interpreter import Interpreter
+        except ImportError:
+            import tensorflow as tf
+            Interpreter = tf.lite.Interpreter
+        
+        self.interpreter = Interpreter(model_path=model_path, num_threads=os.cpu_count())
+        self.interpreter.allocate_tensors()
+        self.input_detail = self.interpreter.get_input_details()[0]
+        self.output_detail = self.interpreter.get_output_details()[0]
+        self.batch_size = None
+        self.lock = threading.Lock()
+    
+    def predict(self, input_batch):
+        with self.lock:
+            if self.input_detail['shape_signature'][0] != -1:
+                # Models exported with a fixed batch of one (convert_model.py) run per window
+                return np.concatenate([self._invoke(window[np.newaxis]) for window in input_batch])
+            
+            if self.batch_size != len(input_batch):
+                self.interpreter.resize_tensor_input(self.input_detail['index'], input_batch.shape)
+                self.interpreter.allocate_tensors()
+                self.input_detail = self.interpreter.get_input_details()[0]
+                self.output_detail = self.interpreter.get_output_details()[0]
+                self.batch_size = len(input_batch)
+            return self._invoke(input_batch)
+    
+    def _invoke(self, input_batch):
+        input_scale, input_zero_point = self.input_detail['quantization']
+        if input_scale:
+            input_batch = np.round(input_batch / input_scale + input_zero_point)
+        self.interpreter.set_tensor(self.input_detail['index'], input_batch.astype(self.input_detail['dtype']))
+        self.interpreter.invoke()
+        output = self.interpreter.get_tensor(self.output_detail['index'])
+        
+        output_scale, output_zero_point = self.output_detail['quantization']
+        if output_scale:
+            output = (output.astype(np.float32) - output_zero_point) * output_scale
+        return output
+
+def backend_model_path(model_path, backend):
+    """Path of the converted model file a backend loads for a .h5 model"""
+    if backend not in MODEL_BACKENDS:
+        raise ValueError(f"Unknown model backend '{backend}' (choose from {', '.join(MODEL_BACKENDS)})")
+    if backend == 'keras':
+        return model_path
+    return os.path.splitext(model_path)[0] + MODEL_BACKENDS[backend]
+
+def load_backend(model_path, backend):
+    """Instantiate the inference backend for a model file"""
+    if backend == 'keras':
+        return KerasBackend(model_path)
+    if backend == 'onnx':
+        return OnnxBackend(model_path)
+    return TFLiteBackend(model_path)
+
+def is_cloud_demo():
+    """Streamlit Cloud runs without the model and simulates detection"""
+    return "streamlit.io" in os.getenv("STREAMLIT_SERVER_HEAD", "") or \
+           "cloudspace" in os.getenv("HOME", "")
+
+# Shared model registry
+_model_registry = {}
+_detector_registry = {}
+_model_versions = {}
+_registry_lock = threading.Lock()
+
+def get_model(model_path, warmup_shape=(1, 16, 64, 64, 3), backend=MODEL_BACKEND):
+    """Load a model once per process and warm it up; returns None if unavailable"""
+    with _registry_lock:
+        key = (model_path, backend)
+        if key in _model_registry:
+            return _model_registry[key]['model']
+        
+        entry = {'model': None, 'load_seconds': 0.0, 'warmup_seconds': 0.0, 'error': None}
+        _model_registry[key] = entry
+        
+        try:
+            backend_path = backend_model_path(model_path, backend)
+            if not os.path.exists(backend_path):
+                entry['error'] = f"Model file not found: {backend_path}"
+                print(f"⚠️ {entry['error']} - using simulated detection")
+                return None
+            
+            started = time.perf_counter()
+            model = load_backend(backend_path, backend)
+            entry['load_seconds'] = time.perf_counter() - started
+            
+            started = time.perf_counter()
+            model.predict(np.zeros(warmup_shape, dtype=np.float32))
+            entry['warmup_seconds'] = time.perf_counter() - started
+            
+            entry['model'] = model
+            print(f"✅ Model loaded: {backend_path} [{backend}] "
+                  f"(load {entry['load_seconds']:.2f}s, warm-up {entry['warmup_seconds']:.2f}s)")
+        except Exception as e:
+            entry['error'] = str(e)
+            print(f"❌ Model load error: {e} - using simulated detection")
+        
+        return entry['model']
+
+def get_model_stats():
+    """Load/warm-up timings for every model loaded in this process"""
+    with _registry_lock:
+        return {
+            f"{path} [{backend}]": {key: value for key, value in entry.items() if key != 'model'}
+            for (path, backend), entry in _model_registry.items()
+        }
+
+def get_model_version(model_path=DEFAULT_MODEL_PATH, backend=MODEL_BACKEND):
+    """Backend plus a hash of the model file it loads; None when detection would be simulated"""
+    if is_cloud_demo():
+        return None
+    backend_path = backend_model_path(model_path, backend)
+    if not os.path.exists(backend_path):
+        return None
+    
+    stat = os.stat(backend_path)
+    key = (backend_path, stat.st_size, stat.st_mtime)
+    with _registry_lock:
+        if key not in _model_versions:
+            digest = hashlib.sha256()
+            with open(backend_path, "rb") as f:
+                for chunk in iter(lambda: f.read(1 << 20), b""):
+                    digest.update(chunk)
+            _model_versions[key] = f"{backend}:{digest.hexdigest()[:16]}"
+        return _model_versions[key]
+
+def get_detector(model_path=DEFAULT_MODEL_PATH, backend=MODEL_BACKEND):
+    """Get the process-wide ViolenceDetector for a model path and backend"""
+    key = (model_path, backend)
+    detector = _detector_registry.get(key)
+    if detector is None:
+        detector = ViolenceDetector(model_path, backend)
+        _detector_registry.setdefault(key, detector)
+    return _detector_registry[key]
+
+# Violence Detection Model
+class ViolenceDetector:
+    def __init__(self, model_path=DEFAULT_MODEL_PATH, backend=MODEL_BACKEND):
+        """Initialize violence detection model"""
+        is_cloud = is_cloud_demo()
+        
+        self.is_demo = is_cloud
+        self.model_path = model_path
+        self.backend = backend
+        self.sequence_length = 16
+        self.image_size = (64, 64)
+        self.model = None
+        
+        self.frame_encoder = None
+        self.temporal_head = None
+        
+        if not is_cloud:
+            warmup_shape = (1, self.sequence_length, self.image_size[1], self.image_size[0], 3)
+            self.model = get_model(model_path, warmup_shape, backend)
+        
+        if self.model is not None and hasattr(self.model, 'split_stages'):
+            stages = self.model.split_stages()
+            if stages:
+                self.frame_encoder, self.temporal_head = stages
+        
+        if is_cloud:
+            print("🌐 Cloud demo mode - using simulated detection")
+        elif self.model is not None:
+            print("✅ Model ready")
+    
+    def prepare_window(self, frames):
+        """Return a window as a (sequence_length, H, W, 3) uint8 array"""
+        expected_shape = (self.image_size[1], self.image_size[0], 3)
+        if isinstance(frames, np.ndarray) and frames.dtype == np.uint8 and frames.shape[1:] == expected_shape:
+            return frames
+        return np.stack([cv2.resize(frame, self.image_size) for frame in frames])
+    
+    def normalize_windows(self, windows):
+        """Stack uint8 windows into a float32 model input batch"""
+        input_batch = np.stack([self.prepare_window(frames) for frames in windows]).astype(np.float32)
+        input_batch *= 1.0 / 255.0
+        return input_batch
+    
+    def detect_violence(self, frames):
+        """Detect violence in frame sequence"""
+        import random
+        
+        if self.is_demo or self.model is None:
+            rand = random.random()
+            if rand > 0.7:
+                confidence = random.uniform(0.82, 0.98)
+                return True, confidence
+            else:
+                return False, random.uniform(0.1, 0.4)
+        
+        try:
+            input_batch = self.normalize_windows([frames])
+            prediction = self.model.predict(input_batch)[0]
+            violence_confidence = prediction[1]
+            is_violent = violence_confidence > CONFIDENCE_THRESHOLD
+            
+            return is_violent, violence_confidence
+        
+        except Exception as e:
+            print(f"Detection error: {e}")
+            return False, 0.0
+    
+    def detect_violence_batch(self, windows):
+        """Detect violence in several frame sequences with one forward pass"""
+        if not windows:
+            return []
+        
+        if self.is_demo or self.model is None:
+            return [self.detect_violence(frames) for frames in windows]
+        
+        try:
+            input_batch = self.normalize_windows(windows)
+            predictions = self.model.predict(input_batch)
+            
+            results = []
+            for prediction in predictions:
+                violence_confidence = float(prediction[1])
+                results.append((violence_confidence > CONFIDENCE_THRESHOLD, violence_confidence))
+            return results
+        
+        except Exception as e:
+            print(f"Batch detection error: {e}")
+            return [(False, 0.0)] * len(windows)
+    
+    def supports_feature_cache(self):
+        """Whether windows can be scored from cached per-frame embeddings"""
+        return not self.is_demo and self.frame_encoder is not None
+    
+    def encode_frames(self, frames):
+        """Run the frame encoder on (N, H, W, 3) uint8 frames; returns per-frame embeddings"""
+        input_batch = frames.astype(np.float32)
+        input_batch *= 1.0 / 255.0
+        # Calling the model directly avoids predict()'s per-call setup, which
+        # dominates for the handful of frames encoded per window
+        return np.asarray(self.frame_encoder(input_batch, training=False))
+    
+    def detect_violence_features(self, feature_windows):
+        """Score windows of cached frame embeddings with the temporal head only"""
+        if not feature_windows:
+            return []
+        
+        try:
+            predictions = np.asarray(self.temporal_head(np.stack(feature_windows), training=False))
+            
+            results = []
+            for prediction in predictions:
+                violence_confidence = float(prediction[1])
+                results.append((violence_confidence > CONFIDENCE_THRESHOLD, violence_confidence))
+            return results
+        
+        except Exception as e:
+            print(f"Feature detection error: {e}")
+            return [(False, 0.0)] * len(feature_windows)
+
+def motion_score(window, pixel_delta=25):
+    """Largest fraction of pixels that change between consecutive frames of a uint8 window"""
+    gray = window.mean(axis=-1, dtype=np.float32)
+    changed = np.abs(np.diff(gray, axis=0)) > pixel_delta
+    return float(changed.mean(axis=(1, 2)).max()) if len(changed) else 0.0
+
+class FrameRingBuffer:
+    """Fixed-size ring buffer of resized uint8 frames"""
+    
+    def __init__(self, capacity=16, image_size=(64, 64)):
+        self.capacity = capacity
+        self.image_size = image_size
+        self.frames = np.zeros((capacity, image_size[1], image_size[0], 3), dtype=np.uint8)
+        self.next_index = 0
+        self.count = 0
+    
+    def __len__(self):
+        return self.count
+    
+    def is_full(self):
+        return self.count == self.capacity
+    
+    def push(self, frame):
+        """Resize a full-resolution frame straight into the next slot"""
+        cv2.resize(frame, self.image_size, dst=self.frames[self.next_index])
+        self.next_index = (self.next_index + 1) % self.capacity
+        self.count = min(self.count + 1, self.capacity)
+    
+    def window(self):
+        """Return a copy of the buffered frames, oldest first"""
+        if not self.is_full():
+            return self.frames[:self.count].copy()
+        return np.concatenate((self.frames[self.next_index:], self.frames[:self.next_index]))
+    
+    def latest(self, count):
+        """Return a copy of the newest `count` frames, oldest first"""
+        return self.window()[-count:] if count > 0 else self.frames[:0].copy()
+    
+    def clear(self):
+        self.next_index = 0
+        self.count = 0
+
+class FeatureCache:
+    """Rolling cache of per-frame embeddings so each frame is encoded once
+    
+    New frames are queued and encoded together when their windows are
+    scored, so the encoder runs once per batch rather than once per window.
+    """
+    
+    def __init__(self, capacity=16):
+        self.capacity = capacity
+        self.features = None
+        self.pending_frames = []
+        self.frames_added = 0
+    
+    def add_frames(self, frames):
+        """Queue the frames that follow the last ones added; returns the window's end position"""
+        if len(frames):
+            self.pending_frames.append(frames)
+            self.frames_added += len(frames)
+        return self.frames_added
+    
+    def windows(self, end_positions, encode_frames):
+        """Encode queued frames and return the embedding window ending at each position"""
+        cached = [] if self.features is None else [self.features]
+        if self.pending_frames:
+            cached.append(encode_frames(np.concatenate(self.pending_frames)))
+            self.pending_frames = []
+        
+        features = np.concatenate(cached)
+        offset = self.frames_added - len(features)
+        windows = [features[end - offset - self.capacity:end - offset] for end in end_positions]
+        self.features = features[-self.capacity:].copy()
+        return windows
+
+class WindowBatcher:
+    """Collect frame windows and score them together in batches"""
+    
+    def __init__(self, detector, batch_size=8, max_wait=2.0, scorer=None):
+        self.detector = detector
+        self.scorer = scorer or detector.detect_violence_batch
+        self.batch_size = max(1, int(batch_size))
+        self.max_wait = max_wait
+        self.windows = []
+        self.metadata = []
+        self.first_added_at = None
+    
+    def add(self, frames, metadata):
+        """Queue a window; returns (metadata, result) pairs once a batch is flushed"""
+        if not self.windows:
+            self.first_added_at = time.monotonic()
+        self.windows.append(frames)
+        self.metadata.append(metadata)
+        
+        waited = time.monotonic() - self.first_added_at
+        if len(self.windows) >= self.batch_size or waited >= self.max_wait:
+            return self.flush()
+        return []
+    
+    def flush(self):
+        """Score all queued windows and return (metadata, result) pairs"""
+        if not self.windows:
+            return []
+        results = self.scorer(self.windows)
+        scored = list(zip(self.metadata, results))
+        self.windows = []
+        self.metadata = []
+        self.first_added_at = None
+        return scored
@@ -0,0 +1,95 @@
+# Fake Resend Endpoint
+# Local stand-in for the Resend email API, for exercising the notification
+# outbox without sending real email.
+#
+#   python fake_resend.py --port 8025 --fail-first 2
+#   RESEND_API_URL=http://localhost:8025/emails RESEND_API_KEY=test streamlit run app.py
+
+import sys
+import json
+import time
+import uuid
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+class FakeResendServer(ThreadingHTTPServer):
+    """Records POSTed emails, de-duplicated by Idempotency-Key like Resend does"""
+    
+    def __init__(self, port=8025, fail_first=0, fail_status=500, latency=0.0):
+        super().__init__(("127.0.0.1", port), FakeResendHandler)
+        self.fail_remaining = fail_first
+        self.fail_status = fail_status
+        self.latency = latency
+        self.emails = []
+        self.requests = 0
+        self.duplicates = 0
+        self.ids_by_key = {}
+        self.lock = threading.Lock()
+    
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}/emails"
+    
+    def start(self):
+        """Serve on a background thread (for scripted checks)"""
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+class FakeResendHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        server = self.server
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if server.latency:
+            time.sleep(server.latency)
+        
+        with server.lock:
+            server.requests += 1
+            if server.fail_remaining > 0:
+                server.fail_remaining -= 1
+                return self._reply(server.fail_status, {"message": "simulated failure"})
+            
+            key = self.headers.get("Idempotency-Key")
+            if key in server.ids_by_key:
+                server.duplicates += 1
+                return self._reply(200, {"id": server.ids_by_key[key]})
+            
+            email_id = str(uuid.uuid4())
+            if key:
+                server.ids_by_key[key] = email_id
+            email = json.loads(body or b"{}")
+            server.emails.append(email)
+        
+        print(f"📨 {email.get('to')} - {email.get('subject')}")
+        self._reply(200, {"id": email_id})
+    
+    def _reply(self, status, payload):
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+    
+    def log_message(self, format, *args):
+        pass
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a local fake of the Resend email API")
+    parser.add_argument("--port", type=int, default=8025)
+    parser.add_argument("--fail-first", type=int, default=0, help="Answer the first N requests with an error")
+    parser.add_argument("--fail-status", type=int, default=500)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds to wait before answering")
+    args = parser.parse_args()
+    
+    server = FakeResendServer(args.port, args.fail_first, args.fail_status, args.latency)
+    print(f"📭 Fake Resend listening on {server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    print(f"📊 {len(server.emails)} emails, {server.duplicates} duplicates, {server.requests} requests")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,115 @@
+import os
+import time
+import queue
+import threading
+from concurrent.futures import Future
+
+from detector import get_detector
+
+SCHEDULER_BATCH_SIZE = int(os.getenv("SCHEDULER_BATCH_SIZE", "32"))
+SCHEDULER_MAX_WAIT_MS = float(os.getenv("SCHEDULER_MAX_WAIT_MS", "50"))
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+class InferenceScheduler:
+    """Micro-batches ready windows from many streams into shared model calls
+    
+    A batch is sent as soon as it reaches max_batch_size or its oldest
+    window has waited max_wait seconds, whichever comes first.
+    """
+    
+    def __init__(self, detector, max_batch_size=32, max_wait=0.05):
+        self.detector = detector
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max_wait
+        self.requests = queue.Queue()
+        self.stats_lock = threading.Lock()
+        self.stream_stats = {}
+        self.batches = 0
+        self.windows = 0
+        self.thread = threading.Thread(target=self._run, name="inference-scheduler", daemon=True)
+        self.thread.start()
+    
+    def submit(self, stream_id, window):
+        """Queue a window; the returned Future resolves to (is_violent, confidence)"""
+        future = Future()
+        with self.stats_lock:
+            stats = self.stream_stats.setdefault(stream_id, {
+                'queue_depth': 0,
+                'windows': 0,
+                'last_latency': 0.0,
+                'total_latency': 0.0
+            })
+            stats['queue_depth'] += 1
+        self.requests.put((stream_id, window, time.monotonic(), future))
+        return future
+    
+    def detect_violence(self, stream_id, window):
+        """Blocking helper for stream loops"""
+        return self.submit(stream_id, window).result()
+    
+    def get_stats(self):
+        """Per-stream queue depth/latency plus overall batch sizes"""
+        with self.stats_lock:
+            streams = {
+                stream_id: {
+                    'queue_depth': stats['queue_depth'],
+                    'windows': stats['windows'],
+                    'last_latency': stats['last_latency'],
+                    'avg_latency': stats['total_latency'] / stats['windows'] if stats['windows'] else 0.0
+                }
+                for stream_id, stats in self.stream_stats.items()
+            }
+            return {
+                'streams': streams,
+                'batches': self.batches,
+                'avg_batch_size': self.windows / self.batches if self.batches else 0.0
+            }
+    
+    def forget_stream(self, stream_id):
+        with self.stats_lock:
+            self.stream_stats.pop(stream_id, None)
+    
+    def _run(self):
+        while True:
+            batch = [self.requests.get()]
+            deadline = batch[0][2] + self.max_wait
+            
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                try:
+                    batch.append(self.requests.get(timeout=remaining) if remaining > 0 else self.requests.get_nowait())
+                except queue.Empty:
+                    break
+            
+            try:
+                results = self.detector.detect_violence_batch([window for _, window, _, _ in batch])
+            except Exception as e:
+                print(f"Scheduler batch error: {e}")
+                results = [(False, 0.0)] * len(batch)
+            
+            finished_at = time.monotonic()
+            with self.stats_lock:
+                self.batches += 1
+                self.windows += len(batch)
+                for stream_id, _, submitted_at, _ in batch:
+                    stats = self.stream_stats.get(stream_id)
+                    if stats:
+                        latency = finished_at - submitted_at
+                        stats['queue_depth'] -= 1
+                        stats['windows'] += 1
+                        stats['last_latency'] = latency
+                        stats['total_latency'] += latency
+            
+            for (_, _, _, future), result in zip(batch, results):
+                future.set_result(result)
+
+def get_inference_scheduler():
+    """Process-wide scheduler shared by every live stream"""
+    global _scheduler
+    
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = InferenceScheduler(get_detector(), SCHEDULER_BATCH_SIZE, SCHEDULER_MAX_WAIT_MS / 1000.0)
+        return _scheduler
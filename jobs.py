@@ -0,0 +1,162 @@
+import os
+import time
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+from database import (
+    init_database, claim_video_for_analysis, update_video_progress, update_video_analysis_status,
+    mark_video_failed, get_video_job, get_pending_video_ids, get_user_settings,
+    save_analysis_cache, get_analysis_cache, record_score_timeline, requeue_interrupted_videos,
+    close_connection
+)
+from detector import get_detector, get_model_stats, get_model_version, CONFIDENCE_THRESHOLD
+from notifications import IncidentAlerter
+from video_processing import process_video_file, rederive_video_incidents, resolve_decoder
+
+ANALYSIS_WORKERS = int(os.getenv("ANALYSIS_WORKERS", "2"))
+ANALYSIS_SEGMENTS = int(os.getenv("ANALYSIS_SEGMENTS", "1"))
+ANALYSIS_WINDOW_STRIDE = int(os.getenv("ANALYSIS_WINDOW_STRIDE", "30"))
+MOTION_THRESHOLD = float(os.getenv("MOTION_THRESHOLD", "0"))
+# Seconds between checkpoints an interrupted analysis resumes from (0 = off)
+ANALYSIS_CHECKPOINT_INTERVAL = float(os.getenv("ANALYSIS_CHECKPOINT_INTERVAL", "30"))
+
+_executor = None
+_executor_lock = threading.Lock()
+
+# Progress reporting
+class DatabaseProgressReporter:
+    """Stands in for st.progress/st.empty and writes progress to the videos table"""
+    
+    def __init__(self, video_id, min_interval=1.0):
+        self.video_id = video_id
+        self.min_interval = min_interval
+        self.last_write = 0.0
+    
+    def progress(self, value):
+        now = time.monotonic()
+        if now - self.last_write >= self.min_interval:
+            self.last_write = now
+            update_video_progress(self.video_id, progress=float(value))
+    
+    def text(self, message):
+        update_video_progress(self.video_id, message=message)
+
+def user_confidence_threshold(user_id):
+    """The Confidence Threshold from a user's settings"""
+    settings = get_user_settings(user_id)
+    return settings[1] if settings and settings[1] is not None else CONFIDENCE_THRESHOLD
+
+def analysis_cache_key(content_hash, model_version):
+    """Key of an analysis result: what was analysed, by which model, with which scan settings
+    
+    The decoder is part of it because OpenCV and ffmpeg scale frames
+    differently, so their scores differ. The confidence threshold is not;
+    incidents are re-derived from the cached score timeline at the
+    requesting user's threshold.
+    """
+    return (f"{content_hash}|{model_version}|stride={ANALYSIS_WINDOW_STRIDE}|motion={MOTION_THRESHOLD}"
+            f"|decoder={resolve_decoder()}")
+
+# Worker side
+def warm_up_worker():
+    """Load and warm up the shared detector as soon as a worker starts"""
+    get_detector()
+    return get_model_stats()
+
+def run_analysis_job(video_id):
+    """Analyze one pending video inside a worker process"""
+    if not claim_video_for_analysis(video_id):
+        return None
+    
+    job = get_video_job(video_id)
+    reporter = DatabaseProgressReporter(video_id)
+    confidence_threshold = user_confidence_threshold(job['user_id'])
+    
+    try:
+        detector = get_detector()
+        incidents = process_video_file(
+            job['file_path'],
+            job['user_id'],
+            video_id,
+            detector,
+            reporter,
+            reporter,
+            segments=ANALYSIS_SEGMENTS,
+            window_stride=ANALYSIS_WINDOW_STRIDE,
+            motion_threshold=MOTION_THRESHOLD,
+            alert_origin=job['uploaded_at'],
+            filename=job['filename'],
+            confidence_threshold=confidence_threshold,
+            checkpoint_interval=ANALYSIS_CHECKPOINT_INTERVAL
+        )
+        model_version = get_model_version()
+        if job['content_hash'] and model_version and not detector.is_demo:
+            save_analysis_cache(analysis_cache_key(job['content_hash'], model_version), video_id)
+        return len(incidents)
+    except Exception as e:
+        print(f"❌ Analysis job {video_id} failed: {e}")
+        mark_video_failed(video_id, str(e))
+        return None
+    finally:
+        # Idle workers shouldn't keep the database open between jobs
+        close_connection()
+
+# App side
+def get_executor():
+    """Start the shared worker pool once per process and requeue pending videos"""
+    global _executor
+    
+    with _executor_lock:
+        if _executor is None:
+            init_database()
+            _executor = ProcessPoolExecutor(
+                max_workers=ANALYSIS_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=warm_up_worker
+            )
+            # Start the workers now so the first analysis doesn't pay for model loading
+            for _ in range(ANALYSIS_WORKERS):
+                _executor.submit(warm_up_worker)
+            requeued = requeue_interrupted_videos()
+            if requeued:
+                print(f"⏯️ Resuming {requeued} interrupted analyses")
+            for video_id in get_pending_video_ids():
+                _executor.submit(run_analysis_job, video_id)
+            print(f"✅ Analysis worker pool started ({ANALYSIS_WORKERS} workers)")
+        return _executor
+
+def reuse_cached_analysis(video_id):
+    """Complete a pending video from a cached analysis of identical content; returns False on a miss"""
+    job = get_video_job(video_id)
+    model_version = get_model_version()
+    if not job or not job['content_hash'] or not model_version:
+        return False
+    
+    source_id = get_analysis_cache(analysis_cache_key(job['content_hash'], model_version))
+    source = get_video_job(source_id) if source_id else None
+    if not source or not os.path.exists(source['timeline_path']) or not claim_video_for_analysis(video_id):
+        return False
+    
+    try:
+        # The score timeline is shared, not copied; it is never rewritten after analysis
+        confidence_threshold = user_confidence_threshold(job['user_id'])
+        record_score_timeline(video_id, source['timeline_path'], source['window_stride'], source['fps'],
+                              confidence_threshold)
+        incidents = rederive_video_incidents(get_video_job(video_id), confidence_threshold, source_video_id=source_id)
+        update_video_analysis_status(video_id, len(incidents), source['windows_analyzed'], source['windows_skipped'])
+        
+        if incidents:
+            IncidentAlerter(job['user_id'], video_id, job['filename'], job['uploaded_at']).finish(incidents)
+        print(f"♻️ Reused analysis of video {source_id} for video {video_id} ({len(incidents)} incidents)")
+        return True
+    except Exception as e:
+        print(f"❌ Cached analysis for video {video_id} failed: {e}")
+        mark_video_failed(video_id, str(e))
+        return True
+
+def submit_analysis_job(video_id):
+    """Queue a pending video for background analysis, unless identical content was analysed already"""
+    if reuse_cached_analysis(video_id):
+        return
+    get_executor().submit(run_analysis_job, video_id)
@@ -0,0 +1,287 @@
+import os
+import time
+import queue
+import threading
+from datetime import datetime, timezone
+
+import cv2
+
+from database import (
+    save_video_to_db, save_incident_to_db, update_video_analysis_status, mark_video_failed, get_user_settings,
+    close_connection
+)
+from detector import motion_score, FrameRingBuffer, CONFIDENCE_THRESHOLD
+from inference_scheduler import get_inference_scheduler
+from notifications import IncidentAlerter
+from screenshots import get_screenshot_writer
+from video_processing import format_timestamp
+
+# Process-wide registry of running live pipelines, keyed by video id
+_pipelines = {}
+_pipelines_lock = threading.Lock()
+
+def open_capture(source):
+    """Open an RTSP/HTTP URL, a file path, or a device index given as digits"""
+    if isinstance(source, str) and source.strip().isdigit():
+        return cv2.VideoCapture(int(source))
+    return cv2.VideoCapture(source)
+
+def put_drop_oldest(frame_queue, item):
+    """Put into a bounded queue, discarding the oldest entry when full; returns True if one was dropped"""
+    try:
+        frame_queue.put_nowait(item)
+        return False
+    except queue.Full:
+        pass
+    
+    try:
+        frame_queue.get_nowait()
+    except queue.Empty:
+        pass
+    
+    try:
+        frame_queue.put_nowait(item)
+    except queue.Full:
+        pass
+    return True
+
+class LiveStreamPipeline:
+    """Continuous decode → detect pipeline for one camera or stream
+    
+    A decode thread feeds a bounded queue that drops the oldest frames when
+    detection falls behind, so latency stays bounded instead of growing.
+    Frames are queued already resized to the model input; only window-end
+    frames, the ones incident screenshots are taken from, keep a
+    full-resolution copy, so queue memory doesn't grow with resolution.
+    Set realtime=True to replay a local file at its native frame rate.
+    
+    Windows are scored through the shared InferenceScheduler, which batches
+    them with other streams' windows, unless an explicit detector is given.
+    """
+    
+    def __init__(self, source, user_id, name=None, detector=None, scheduler=None, queue_size=64,
+                 window_stride=30, motion_threshold=0.0, realtime=False, reconnect_delay=2.0,
+                 max_reconnects=5, confidence_threshold=None):
+        if detector is None and scheduler is None:
+            scheduler = get_inference_scheduler()
+        
+        self.source = source
+        self.user_id = user_id
+        self.name = name or str(source)
+        self.scheduler = scheduler
+        self.detector = detector or scheduler.detector
+        self.frame_queue = queue.Queue(maxsize=queue_size)
+        self.window_stride = window_stride
+        self.motion_threshold = motion_threshold
+        if confidence_threshold is None:
+            settings = get_user_settings(user_id)
+            confidence_threshold = settings[1] if settings and settings[1] is not None else CONFIDENCE_THRESHOLD
+        self.confidence_threshold = confidence_threshold
+        self.realtime = realtime
+        self.reconnect_delay = reconnect_delay
+        self.max_reconnects = max_reconnects
+        
+        self.video_id = None
+        self.started_at = None
+        self.alerter = None
+        self.incidents = []
+        self.stop_event = threading.Event()
+        self.decode_done = threading.Event()
+        self.threads = []
+        self.error = None
+        self.finished = False
+        self.finish_lock = threading.Lock()
+        self.stats = {
+            'frames_read': 0,
+            'frames_dropped': 0,
+            'windows_scored': 0,
+            'windows_skipped': 0,
+            'incidents': 0,
+            'last_latency': 0.0,
+            'max_latency': 0.0
+        }
+    
+    def start(self):
+        """Register the stream as a video and start the decode and detect threads"""
+        self.video_id = save_video_to_db(self.user_id, self.name, str(self.source), analysis_status='running',
+                                         source='live')
+        self.started_at = time.time()
+        # Time-to-alert for a stream runs from the capture of the frame that triggered it
+        self.alerter = IncidentAlerter(self.user_id, self.video_id, self.name)
+        
+        self.threads = [
+            threading.Thread(target=self._decode_loop, name=f"live-decode-{self.video_id}", daemon=True),
+            threading.Thread(target=self._detect_loop, name=f"live-detect-{self.video_id}", daemon=True)
+        ]
+        for thread in self.threads:
+            thread.start()
+        
+        with _pipelines_lock:
+            _pipelines[self.video_id] = self
+        print(f"📡 Live stream started: {self.name} (video {self.video_id})")
+        return self.video_id
+    
+    def stop(self, timeout=10.0):
+        """Stop both threads and mark the stream's video as completed"""
+        self.stop_event.set()
+        for thread in self.threads:
+            if thread is not threading.current_thread():
+                thread.join(timeout)
+        self._finish()
+    
+    def _finish(self):
+        with self.finish_lock:
+            if self.finished:
+                return
+            self.finished = True
+        
+        with _pipelines_lock:
+            _pipelines.pop(self.video_id, None)
+        if self.scheduler:
+            self.scheduler.forget_stream(self.video_id)
+        self.alerter.finish(self.incidents)
+        if self.error:
+            mark_video_failed(self.video_id, self.error)
+        else:
+            update_video_analysis_status(self.video_id, self.stats['incidents'],
+                                         self.stats['windows_scored'], self.stats['windows_skipped'])
+        print(f"🛑 Live stream stopped: {self.name} (video {self.video_id})")
+    
+    def is_running(self):
+        return any(thread.is_alive() for thread in self.threads)
+    
+    def scheduler_stats(self):
+        """This stream's queue depth and latency in the shared scheduler, if used"""
+        if not self.scheduler:
+            return None
+        return self.scheduler.get_stats()['streams'].get(self.video_id)
+    
+    def _decode_loop(self):
+        """Read frames as fast as the source delivers them"""
+        reconnects = 0
+        frame_number = 0
+        
+        try:
+            while not self.stop_event.is_set():
+                cap = open_capture(self.source)
+                if not cap.isOpened():
+                    cap.release()
+                    reconnects += 1
+                    if reconnects > self.max_reconnects:
+                        self.error = f"Could not open stream: {self.source}"
+                        return
+                    time.sleep(self.reconnect_delay)
+                    continue
+                
+                fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+                frame_interval = 1.0 / fps if self.realtime and fps > 0 else 0.0
+                next_frame_at = time.monotonic()
+                
+                while not self.stop_event.is_set():
+                    ret, frame = cap.read()
+                    if not ret:
+                        break
+                    
+                    reconnects = 0
+                    frame_number += 1
+                    self.stats['frames_read'] += 1
+                    model_frame = cv2.resize(frame, self.detector.image_size)
+                    screenshot_frame = frame if frame_number % self.window_stride == 0 else None
+                    if put_drop_oldest(self.frame_queue, (frame_number, time.time(), model_frame, screenshot_frame)):
+                        self.stats['frames_dropped'] += 1
+                    
+                    if frame_interval:
+                        next_frame_at += frame_interval
+                        time.sleep(max(0.0, next_frame_at - time.monotonic()))
+                
+                cap.release()
+                
+                # Files end; live sources get reconnected
+                if os.path.isfile(str(self.source)):
+                    return
+                reconnects += 1
+                if reconnects > self.max_reconnects:
+                    self.error = f"Stream ended: {self.source}"
+                    return
+                time.sleep(self.reconnect_delay)
+        finally:
+            self.decode_done.set()
+    
+    def _detect_loop(self):
+        """Score a window every window_stride frames and record incidents"""
+        frame_buffer = FrameRingBuffer(self.detector.sequence_length, self.detector.image_size)
+        
+        while not self.stop_event.is_set():
+            try:
+                frame_number, captured_at, frame, screenshot_frame = self.frame_queue.get(timeout=0.5)
+            except queue.Empty:
+                if self.decode_done.is_set():
+                    break
+                continue
+            
+            frame_buffer.push(frame)
+            if frame_number % self.window_stride != 0 or not frame_buffer.is_full():
+                continue
+            
+            window = frame_buffer.window()
+            if self.motion_threshold > 0 and motion_score(window) < self.motion_threshold:
+                self.stats['windows_skipped'] += 1
+                continue
+            
+            if self.scheduler:
+                is_violent, confidence = self.scheduler.detect_violence(self.video_id, window)
+            else:
+                is_violent, confidence = self.detector.detect_violence(window)
+            self.stats['windows_scored'] += 1
+            
+            latency = time.time() - captured_at
+            self.stats['last_latency'] = latency
+            self.stats['max_latency'] = max(self.stats['max_latency'], latency)
+            
+            if confidence > self.confidence_threshold:
+                self._record_incident(frame_number, captured_at, float(confidence), screenshot_frame)
+        
+        # The source ended (or stop() was called): finalize the stream's video
+        self.stop_event.set()
+        self._finish()
+        # This thread is done with its pooled connection
+        close_connection()
+    
+    def _record_incident(self, frame_number, captured_at, confidence, frame):
+        timestamp_seconds = captured_at - self.started_at
+        
+        screenshot_dir = f"screenshots/user_{self.user_id}"
+        os.makedirs(screenshot_dir, exist_ok=True)
+        screenshot_path, _ = get_screenshot_writer().save(frame, f"{screenshot_dir}/live_{self.video_id}_{frame_number}")
+        
+        # Same format as SQLite's CURRENT_TIMESTAMP (UTC)
+        detected_at = datetime.fromtimestamp(captured_at, timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+        save_incident_to_db(self.video_id, self.user_id, timestamp_seconds, confidence,
+                            frame_number, screenshot_path, detected_at=detected_at)
+        self.stats['incidents'] += 1
+        
+        incident = {
+            'timestamp_seconds': timestamp_seconds,
+            'timestamp_formatted': format_timestamp(timestamp_seconds),
+            'confidence': confidence,
+            'frame_number': frame_number
+        }
+        self.incidents.append(incident)
+        self.alerter.add(incident, origin=captured_at)
+        print(f"🚨 Live incident on {self.name} at {format_timestamp(timestamp_seconds)} ({confidence:.1%})")
+
+def start_live_stream(source, user_id, name=None, **options):
+    """Start a live pipeline and return its video id"""
+    return LiveStreamPipeline(source, user_id, name, **options).start()
+
+def stop_live_stream(video_id):
+    """Stop a running live pipeline"""
+    with _pipelines_lock:
+        pipeline = _pipelines.get(video_id)
+    if pipeline:
+        pipeline.stop()
+
+def get_live_streams(user_id):
+    """Running live pipelines that belong to a user"""
+    with _pipelines_lock:
+        return [pipeline for pipeline in _pipelines.values() if pipeline.user_id == user_id]
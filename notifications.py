@@ -0,0 +1,295 @@
+import os
+import time
+import random
+import threading
+
+import requests
+
+from database import (
+    get_notification_settings, enqueue_notification, claim_due_notifications,
+    assign_notification_digest, finish_notifications, retry_notifications,
+    requeue_interrupted_notifications, record_time_to_detect, record_time_to_alert, close_connection
+)
+
+RESEND_API_URL = os.getenv("RESEND_API_URL", "https://api.resend.com/emails")
+RESEND_FROM_EMAIL = os.getenv("RESEND_FROM_EMAIL", "onboarding@resend.dev")
+NOTIFICATION_MAX_ATTEMPTS = int(os.getenv("NOTIFICATION_MAX_ATTEMPTS", "6"))
+NOTIFICATION_RETRY_BASE = float(os.getenv("NOTIFICATION_RETRY_BASE", "2"))
+NOTIFICATION_POLL_INTERVAL = float(os.getenv("NOTIFICATION_POLL_INTERVAL", "1"))
+# Alerts for the same user within this many seconds go out as one digest (0 = send each alert)
+NOTIFICATION_DIGEST_WINDOW = float(os.getenv("NOTIFICATION_DIGEST_WINDOW", "300"))
+# "complete": alert once analysis finishes; "first": alert on the first incident, then send an update
+ALERT_MODE = os.getenv("ALERT_MODE", "complete")
+# In either mode, an incident at least this confident is alerted straight away (0 = off)
+URGENT_CONFIDENCE = float(os.getenv("URGENT_CONFIDENCE", "0.95"))
+
+_sender = None
+_sender_lock = threading.Lock()
+
+# Producer side: analyses only write to the outbox
+def queue_email_notification(user_id, video_id, video_filename, incidents, kind='complete', alert_origin=None):
+    """Queue an incident alert for a video; queuing the same kind twice for a video is a no-op
+    
+    kind is 'complete' (all incidents, after analysis), 'first' (sent
+    immediately, skipping the digest window) or 'update' (incidents found
+    after a 'first' alert). alert_origin is the epoch time the
+    time-to-alert of the video is measured from.
+    """
+    if not incidents:
+        return False
+    
+    payload = {
+        'kind': kind,
+        'video_filename': video_filename,
+        'incident_count': len(incidents),
+        'incidents': [
+            {'timestamp_formatted': incident.get('timestamp_formatted', 'N/A'),
+             'confidence': float(incident.get('confidence', 0))}
+            for incident in incidents[:5]
+        ],
+        'alert_origin': alert_origin
+    }
+    delay = 0.0 if kind == 'first' else NOTIFICATION_DIGEST_WINDOW
+    queued = enqueue_notification(user_id, video_id, f"video-{video_id}-{kind}", payload, delay=delay)
+    if queued:
+        print(f"📬 Alert queued for {video_filename} ({kind}, {len(incidents)} incidents)")
+    
+    sender = _sender
+    if sender:
+        sender.wake()
+    return queued
+
+class IncidentAlerter:
+    """Decides when a video's incidents are alerted as they are confirmed
+    
+    The first incident is alerted immediately in "first" mode, or when it
+    reaches urgent_confidence; the remaining incidents follow as an update
+    from finish(). Otherwise finish() queues one alert with everything.
+    """
+    
+    def __init__(self, user_id, video_id, video_filename, alert_origin=None, mode=None,
+                 urgent_confidence=None, before_alert=None):
+        self.user_id = user_id
+        self.video_id = video_id
+        self.video_filename = video_filename
+        self.alert_origin = alert_origin
+        self.mode = mode or ALERT_MODE
+        self.urgent_confidence = URGENT_CONFIDENCE if urgent_confidence is None else urgent_confidence
+        self.before_alert = before_alert
+        self.first_incident = None
+    
+    def add(self, incident, origin=None):
+        """Handle a confirmed incident; origin (e.g. frame capture time) overrides alert_origin"""
+        if self.alert_origin is None:
+            self.alert_origin = origin
+        if self.first_incident is not None:
+            return
+        
+        urgent = self.urgent_confidence and float(incident['confidence']) >= self.urgent_confidence
+        if self.mode == 'first' or urgent:
+            # e.g. flush buffered incident writes so the dashboard already shows it
+            if self.before_alert:
+                self.before_alert()
+            self.first_incident = incident
+            self._queue([incident], 'first')
+    
+    def finish(self, incidents):
+        """Queue the alert (or follow-up update) for everything not alerted yet"""
+        if self.first_incident is None:
+            self._queue(incidents, 'complete')
+            return
+        
+        first_frame = self.first_incident['frame_number']
+        remaining = [incident for incident in incidents if incident['frame_number'] != first_frame]
+        self._queue(remaining, 'update')
+    
+    def _queue(self, incidents, kind):
+        if not incidents:
+            return
+        if kind != 'update' and self.alert_origin is not None:
+            record_time_to_detect(self.video_id, time.time() - self.alert_origin)
+        queue_email_notification(self.user_id, self.video_id, self.video_filename, incidents,
+                                 kind=kind, alert_origin=self.alert_origin)
+
+def render_email(payloads):
+    """Subject and HTML body for one or more outbox payloads, grouped by video"""
+    total_incidents = sum(payload['incident_count'] for payload in payloads)
+    
+    sections = ""
+    for payload in payloads:
+        incident_text = ""
+        for incident in payload['incidents']:
+            incident_text += f"<li>Time: {incident['timestamp_formatted']} - Confidence: {incident['confidence']:.1%}</li>"
+        
+        kind = payload.get('kind', 'complete')
+        if kind == 'first':
+            heading = f"<strong>First incident</strong> in <strong>{payload['video_filename']}</strong> - analysis is continuing, updates will follow"
+        elif kind == 'update':
+            heading = f"<strong>{payload['incident_count']} more incidents</strong> in <strong>{payload['video_filename']}</strong>"
+        else:
+            heading = f"<strong>{payload['incident_count']} incidents</strong> in <strong>{payload['video_filename']}</strong>"
+        sections += f"""
+    <p>{heading}</p>
+    <ul>{incident_text}</ul>"""
+    
+    html_body = f"""
+    <h2>🚨 VIOLENCE DETECTED!</h2>{sections}
+    <p><a href="https://violence-detection-cctv-niranjana006.streamlit.app" style="background:#ff4b4b;color:white;padding:10px 20px;text-decoration:none;border-radius:5px">View Dashboard</a></p>
+    """
+    
+    if len(payloads) == 1 and payloads[0].get('kind') == 'first':
+        return f"🚨 Violence Detected in {payloads[0]['video_filename']}", html_body
+    if len(payloads) == 1:
+        return f"🚨 {total_incidents} Violence Incidents Detected", html_body
+    return f"🚨 {total_incidents} Violence Incidents Detected in {len(payloads)} Videos", html_body
+
+# Delivery side
+class NotificationSender:
+    """Background thread that delivers the outbox through a persistent HTTP session
+    
+    A user's pending alerts are coalesced into one digest email. Transient
+    failures (network errors, 429, 5xx) are retried with exponential
+    backoff; each digest carries a fixed idempotency key so a retry after a
+    timeout can't be delivered twice.
+    """
+    
+    def __init__(self, api_key=None, api_url=RESEND_API_URL, poll_interval=NOTIFICATION_POLL_INTERVAL,
+                 max_attempts=NOTIFICATION_MAX_ATTEMPTS, retry_base=NOTIFICATION_RETRY_BASE):
+        self.api_key = api_key or os.getenv("RESEND_API_KEY")
+        self.api_url = api_url
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.retry_base = retry_base
+        self.session = requests.Session()
+        self.session.headers.update({
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json"
+        })
+        self.wake_event = threading.Event()
+        self.stop_event = threading.Event()
+        self.stats = {'sent': 0, 'retried': 0, 'failed': 0, 'skipped': 0, 'sends_saved': 0}
+        self.thread = threading.Thread(target=self._run, name="notification-sender", daemon=True)
+    
+    def start(self):
+        requeued = requeue_interrupted_notifications()
+        if requeued:
+            print(f"📬 Requeued {requeued} interrupted notifications")
+        self.thread.start()
+        return self
+    
+    def stop(self, timeout=10.0):
+        self.stop_event.set()
+        self.wake_event.set()
+        self.thread.join(timeout)
+        self.session.close()
+    
+    def wake(self):
+        """Deliver without waiting for the next poll"""
+        self.wake_event.set()
+    
+    def _run(self):
+        while not self.stop_event.is_set():
+            try:
+                notifications = claim_due_notifications()
+            except Exception as e:
+                print(f"❌ Outbox error: {e}")
+                notifications = []
+            
+            for digest in self.group_digests(notifications):
+                self.deliver(digest)
+            
+            if not notifications:
+                self.wake_event.wait(self.poll_interval)
+                self.wake_event.clear()
+        close_connection()
+    
+    def group_digests(self, notifications):
+        """Split claimed rows into digests: one per user, plus any earlier digest being retried"""
+        digests = {}
+        new_rows = {}
+        for notification in notifications:
+            notification_id, user_id, video_id, digest_id, payload, attempts = notification
+            if digest_id is not None:
+                digests.setdefault(digest_id, []).append(notification)
+            else:
+                new_rows.setdefault(user_id, []).append(notification)
+        
+        for rows in new_rows.values():
+            # A digest is named after its first row; retries keep the same rows and key
+            digest_id = rows[0][0]
+            assign_notification_digest([row[0] for row in rows], digest_id)
+            digests[digest_id] = rows
+        return [
+            {'digest_id': digest_id, 'user_id': rows[0][1], 'ids': [row[0] for row in rows],
+             'video_ids': [row[2] for row in rows], 'payloads': [row[4] for row in rows],
+             'attempts': max(row[5] for row in rows)}
+            for digest_id, rows in sorted(digests.items())
+        ]
+    
+    def deliver(self, digest):
+        """Send one digest email and record the outcome on all of its outbox rows"""
+        ids = digest['ids']
+        attempts = digest['attempts']
+        settings = get_notification_settings(digest['user_id'])
+        if not settings or not settings[0] or not settings[1]:
+            finish_notifications(ids, 'skipped', "Email disabled/missing")
+            self.stats['skipped'] += len(ids)
+            return
+        
+        if not self.api_key:
+            finish_notifications(ids, 'skipped', "No Resend API key")
+            self.stats['skipped'] += len(ids)
+            print("❌ No Resend API key - notification skipped")
+            return
+        
+        email_addr = settings[1]
+        subject, html_body = render_email(digest['payloads'])
+        try:
+            response = self.session.post(
+                self.api_url,
+                headers={"Idempotency-Key": f"digest-{digest['digest_id']}"},
+                json={
+                    "from": f"Violence Detection <{RESEND_FROM_EMAIL}>",
+                    "to": [email_addr],
+                    "subject": subject,
+                    "html": html_body
+                },
+                timeout=10
+            )
+            if response.status_code < 300:
+                finish_notifications(ids, 'sent')
+                sent_at = time.time()
+                record_time_to_alert([
+                    (video_id, sent_at - payload['alert_origin'])
+                    for video_id, payload in zip(digest['video_ids'], digest['payloads'])
+                    if video_id is not None and payload.get('alert_origin') is not None
+                ])
+                self.stats['sent'] += 1
+                self.stats['sends_saved'] += len(ids) - 1
+                print(f"✅ Alert email sent → {email_addr} ({len(ids)} alerts, {len(ids) - 1} sends saved)")
+                return
+            error = f"HTTP {response.status_code}: {response.text[:200]}"
+            retryable = response.status_code == 429 or response.status_code >= 500
+        except requests.RequestException as e:
+            error = str(e)
+            retryable = True
+        
+        if retryable and attempts < self.max_attempts:
+            # Exponential backoff with jitter: base, 2*base, 4*base, ...
+            delay = self.retry_base * (2 ** (attempts - 1)) * random.uniform(0.8, 1.2)
+            retry_notifications(ids, error, delay)
+            self.stats['retried'] += 1
+            print(f"⚠️ Alert email attempt {attempts} failed ({error}) - retrying in {delay:.1f}s")
+        else:
+            finish_notifications(ids, 'failed', error)
+            self.stats['failed'] += 1
+            print(f"❌ Alert email failed after {attempts} attempts: {error}")
+
+def get_notification_sender():
+    """Start the process-wide notification sender once"""
+    global _sender
+    
+    with _sender_lock:
+        if _sender is None:
+            _sender = NotificationSender().start()
+        return _sender
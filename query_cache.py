@@ -0,0 +1,54 @@
+import time
+import threading
+from collections import OrderedDict
+
+class QueryCache:
+    """Thread-safe LRU cache of query results with a TTL and per-user invalidation
+    
+    Each entry remembers the user's data generation when it was stored; a
+    lookup with a newer generation is a miss, so writes made by other
+    processes invalidate entries too.
+    """
+    
+    def __init__(self, max_entries=256, ttl=30.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+    
+    def get(self, key, generation):
+        """Cached value for key, or None if missing, expired or from an older generation"""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or entry[0] != generation or time.monotonic() - entry[1] > self.ttl:
+                if entry is not None:
+                    del self.entries[key]
+                self.misses += 1
+                return None
+            
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[2]
+    
+    def set(self, key, generation, value):
+        with self.lock:
+            self.entries[key] = (generation, time.monotonic(), value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+    
+    def invalidate_user(self, user_id):
+        """Drop every entry belonging to a user (keys start with the user id)"""
+        with self.lock:
+            for key in [key for key in self.entries if key[0] == user_id]:
+                del self.entries[key]
+    
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+    
+    def get_stats(self):
+        with self.lock:
+            return {'entries': len(self.entries), 'hits': self.hits, 'misses': self.misses}
@@ -1,46 +1,32 @@
 # Quick Database Fix Script
 # Run this to fix the database schema error
 
-import sqlite3
 import os
+import argparse
+
+from database import migrate_database, get_schema_version, rebuild_daily_stats, SCHEMA_VERSION
 
 def fix_database():
-    """Fix the database schema by adding missing columns"""
+    """Bring the database schema up to date by applying pending migrations"""
     print("🔧 Fixing database schema...")
     
-    # Connect to database
-    conn = sqlite3.connect('violence_detection.db')
-    cursor = conn.cursor()
-    
     try:
-        # Check if last_login column exists
-        cursor.execute("PRAGMA table_info(users)")
-        columns = [column[1] for column in cursor.fetchall()]
-        
-        if 'last_login' not in columns:
-            print("📝 Adding missing last_login column...")
-            cursor.execute('ALTER TABLE users ADD COLUMN last_login TIMESTAMP')
-            print("✅ Added last_login column")
-        else:
-            print("✅ last_login column already exists")
-        
-        # Commit changes
-        conn.commit()
-        print("✅ Database schema fixed successfully!")
+        current_version = get_schema_version()
+        if current_version >= SCHEMA_VERSION:
+            print(f"✅ Schema already at version {current_version}")
+            return
         
+        migrate_database()
+        print(f"✅ Database schema migrated from version {current_version} to {SCHEMA_VERSION}")
     except Exception as e:
+        # Migrations run in transactions, so a failed one leaves the database untouched
         print(f"Error fixing database: {e}")
-        print("💡 Deleting database to recreate fresh...")
-        conn.close()
-        
-        # Delete and recreate database
-        if os.path.exists('violence_detection.db'):
-            os.remove('violence_detection.db')
-            print("✅ Old database deleted - will recreate automatically")
-    
-    finally:
-        if conn:
-            conn.close()
+
+def rebuild_statistics():
+    """Backfill the per-user daily statistics rollup from the raw tables"""
+    print("📊 Rebuilding daily statistics...")
+    rebuild_daily_stats()
+    print("✅ Daily statistics rebuilt")
 
 def create_env_file():
     """Create .env file from template"""
@@ -70,6 +56,11 @@ SMTP_PORT=587
         print("✅ Created basic .env file")
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Migrate the database and set up the environment")
+    parser.add_argument("--rebuild-stats", action="store_true",
+                        help="Recompute the dashboard's daily statistics from videos and incidents")
+    args = parser.parse_args()
+    
     print("🛡️ Violence Detection System - Quick Fix")
     print("=" * 50)
     
@@ -77,6 +68,10 @@ if __name__ == "__main__":
     fix_database()
     print()
     
+    if args.rebuild_stats:
+        rebuild_statistics()
+        print()
+    
     # Create .env file
     create_env_file()
     print()
@@ -0,0 +1,68 @@
+import os
+
+import numpy as np
+
+SCORE_TIMELINE_DIR = os.getenv("SCORE_TIMELINE_DIR", "timelines")
+# float16 halves the file size; its ~3 significant digits are plenty for a threshold
+SCORE_TIMELINE_DTYPE = os.getenv("SCORE_TIMELINE_DTYPE", "float16")
+
+def timeline_path(video_id, dtype=SCORE_TIMELINE_DTYPE):
+    """Path of a video's score timeline; the suffix records the dtype"""
+    return os.path.join(SCORE_TIMELINE_DIR, f"video_{video_id}.{np.dtype(dtype).name}")
+
+def window_index(frame_number, window_stride):
+    """Timeline index of the window ending at frame_number (a multiple of window_stride)"""
+    return frame_number // window_stride - 1
+
+def window_end_frame(index, window_stride):
+    """Last frame (1-based) of the window stored at a timeline index"""
+    return (index + 1) * window_stride
+
+class ScoreTimeline:
+    """Violence confidence of every analysis window of a video, in a memory-mapped file
+    
+    Entry i is the window ending at frame (i + 1) * window_stride; windows
+    that were never scored (motion-skipped, or before the first full
+    window) are NaN. Segment workers write disjoint ranges of the same file.
+    """
+    
+    def __init__(self, path, mode='r'):
+        self.path = path
+        self.mode = mode
+        self.dtype = np.dtype(os.path.splitext(path)[1].lstrip('.'))
+        self.scores = self._map()
+    
+    @classmethod
+    def create(cls, path, windows):
+        """Create a NaN-filled timeline with room for `windows` entries (it grows if needed)"""
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        dtype = np.dtype(os.path.splitext(path)[1].lstrip('.'))
+        np.full(max(1, windows), np.nan, dtype=dtype).tofile(path)
+        return cls(path, 'r+')
+    
+    def _map(self):
+        if os.path.getsize(self.path) == 0:
+            return np.zeros(0, dtype=self.dtype)
+        return np.memmap(self.path, dtype=self.dtype, mode=self.mode)
+    
+    def __len__(self):
+        return len(self.scores)
+    
+    def set(self, index, confidence):
+        """Store one window's confidence, growing the file past the estimated length"""
+        if index >= len(self.scores):
+            self.flush()
+            missing = max(index + 1 - len(self.scores), len(self.scores) // 4)
+            with open(self.path, "ab") as f:
+                np.full(missing, np.nan, dtype=self.dtype).tofile(f)
+            self.scores = self._map()
+        self.scores[index] = confidence
+    
+    def flush(self):
+        if isinstance(self.scores, np.memmap):
+            self.scores.flush()
+    
+    def windows_above(self, threshold):
+        """Timeline indexes of windows whose confidence is above threshold (NaN never is)"""
+        # A float64 threshold, or numpy compares at the timeline's precision and rounds the threshold
+        return np.flatnonzero(self.scores > np.float64(threshold))
@@ -0,0 +1,119 @@
+import os
+import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+
+import cv2
+
+SCREENSHOT_FORMAT = os.getenv("SCREENSHOT_FORMAT", "jpg").lower().lstrip(".")
+SCREENSHOT_QUALITY = int(os.getenv("SCREENSHOT_QUALITY", "90"))
+THUMBNAIL_WIDTH = int(os.getenv("THUMBNAIL_WIDTH", "320"))
+SCREENSHOT_WRITERS = int(os.getenv("SCREENSHOT_WRITERS", "2"))
+
+# Quality flag per format; PNG has a compression level (0-9) instead
+QUALITY_FLAGS = {
+    'jpg': cv2.IMWRITE_JPEG_QUALITY,
+    'jpeg': cv2.IMWRITE_JPEG_QUALITY,
+    'webp': cv2.IMWRITE_WEBP_QUALITY
+}
+
+_writer = None
+_writer_lock = threading.Lock()
+
+def thumbnail_path(screenshot_path):
+    """Path of the thumbnail written alongside a screenshot"""
+    directory, filename = os.path.split(screenshot_path)
+    return os.path.join(directory, "thumbs", filename)
+
+def link_screenshot(source_path, path_stem):
+    """Give an existing screenshot and its thumbnail a second path; returns the new screenshot path
+    
+    Files are hard-linked (copied across filesystems), so deleting either
+    path later doesn't affect the other.
+    """
+    screenshot_path = f"{path_stem}{os.path.splitext(source_path)[1]}"
+    for source, target in ((source_path, screenshot_path),
+                           (thumbnail_path(source_path), thumbnail_path(screenshot_path))):
+        if not os.path.exists(source) or os.path.exists(target):
+            continue
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        try:
+            os.link(source, target)
+        except OSError:
+            shutil.copy2(source, target)
+    return screenshot_path
+
+def encode_image(image, image_format=SCREENSHOT_FORMAT, quality=SCREENSHOT_QUALITY):
+    """Encode a BGR image to bytes in the given format"""
+    flag = QUALITY_FLAGS.get(image_format)
+    params = [flag, quality] if flag is not None else []
+    ok, data = cv2.imencode(f".{image_format}", image, params)
+    if not ok:
+        raise IOError(f"Could not encode screenshot as {image_format}")
+    return data.tobytes()
+
+class ScreenshotWriter:
+    """Encodes and writes screenshots (plus thumbnails) on a background thread pool
+    
+    save() returns the final paths immediately so the caller can record
+    them; use wait() when the files have to exist, e.g. before an analysis
+    is reported as complete.
+    """
+    
+    def __init__(self, workers=SCREENSHOT_WRITERS, image_format=SCREENSHOT_FORMAT,
+                 quality=SCREENSHOT_QUALITY, thumbnail_width=THUMBNAIL_WIDTH):
+        self.executor = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="screenshot-writer")
+        self.image_format = image_format
+        self.quality = quality
+        self.thumbnail_width = thumbnail_width
+        self.stats_lock = threading.Lock()
+        self.stats = {'written': 0, 'failed': 0}
+    
+    def save(self, frame, path_stem):
+        """Queue a frame for writing to path_stem + extension; returns (screenshot_path, future)
+        
+        The frame must not be modified afterwards. It can also be a callable
+        that returns the frame, to decode it on the writer thread.
+        """
+        screenshot_path = f"{path_stem}.{self.image_format}"
+        return screenshot_path, self.executor.submit(self._write, frame, screenshot_path)
+    
+    def _write(self, frame, screenshot_path):
+        try:
+            if callable(frame):
+                frame = frame()
+                if frame is None:
+                    raise IOError("frame could not be read")
+            os.makedirs(os.path.dirname(thumbnail_path(screenshot_path)), exist_ok=True)
+            with open(screenshot_path, "wb") as f:
+                f.write(encode_image(frame, self.image_format, self.quality))
+            
+            height, width = frame.shape[:2]
+            if width > self.thumbnail_width:
+                size = (self.thumbnail_width, max(1, round(height * self.thumbnail_width / width)))
+                thumbnail = cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+            else:
+                thumbnail = frame
+            with open(thumbnail_path(screenshot_path), "wb") as f:
+                f.write(encode_image(thumbnail, self.image_format, self.quality))
+            
+            with self.stats_lock:
+                self.stats['written'] += 1
+        except Exception as e:
+            with self.stats_lock:
+                self.stats['failed'] += 1
+            print(f"❌ Screenshot write failed ({screenshot_path}): {e}")
+    
+    @staticmethod
+    def wait(futures, timeout=None):
+        """Block until the given save() futures have finished"""
+        wait(futures, timeout=timeout)
+
+def get_screenshot_writer():
+    """Process-wide screenshot writer"""
+    global _writer
+    
+    with _writer_lock:
+        if _writer is None:
+            _writer = ScreenshotWriter()
+        return _writer
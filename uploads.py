@@ -0,0 +1,36 @@
+import os
+import hashlib
+import tempfile
+
+UPLOAD_DIR = os.getenv("UPLOAD_DIR", "uploads")
+UPLOAD_CHUNK_SIZE = 1 << 20
+
+def content_path(content_hash, filename):
+    """Content-addressed location of an upload; the original extension is kept for OpenCV"""
+    extension = os.path.splitext(filename)[1].lower()
+    return os.path.join(UPLOAD_DIR, "sha256", content_hash[:2], f"{content_hash}{extension}")
+
+def store_upload(fileobj, filename):
+    """Stream an upload to disk, hashing it on the way; returns (sha256, path)
+    
+    Identical files share one copy. The data is written to a temporary file
+    and renamed into place, so readers never see a partial file.
+    """
+    staging_dir = os.path.join(UPLOAD_DIR, "sha256")
+    os.makedirs(staging_dir, exist_ok=True)
+    digest = hashlib.sha256()
+    
+    fileobj.seek(0)
+    with tempfile.NamedTemporaryFile(dir=staging_dir, suffix=".part", delete=False) as temp:
+        for chunk in iter(lambda: fileobj.read(UPLOAD_CHUNK_SIZE), b""):
+            digest.update(chunk)
+            temp.write(chunk)
+    
+    content_hash = digest.hexdigest()
+    path = content_path(content_hash, filename)
+    if os.path.exists(path):
+        os.remove(temp.name)
+    else:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.replace(temp.name, path)
+    return content_hash, path
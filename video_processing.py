@@ -0,0 +1,719 @@
+import os
+import time
+import queue
+import shutil
+import threading
+import tempfile
+import subprocess
+import multiprocessing
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+import cv2
+import numpy as np
+
+from database import (
+    update_video_analysis_status, IncidentWriter, record_score_timeline, replace_video_incidents,
+    get_video_incidents, save_analysis_checkpoint, get_analysis_checkpoints, clear_analysis_checkpoints,
+    get_video_job
+)
+from detector import (
+    get_detector, motion_score, FrameRingBuffer, FeatureCache, WindowBatcher, CONFIDENCE_THRESHOLD
+)
+from notifications import IncidentAlerter
+from score_timeline import ScoreTimeline, timeline_path, window_index, window_end_frame
+from screenshots import get_screenshot_writer, link_screenshot
+
+PIPELINE_QUEUE_SIZE = int(os.getenv("PIPELINE_QUEUE_SIZE", "16"))
+# "opencv" decodes full frames and resizes them; "ffmpeg" pipes frames already scaled to the model size
+VIDEO_DECODER = os.getenv("VIDEO_DECODER", "opencv")
+FFMPEG_PATH = os.getenv("FFMPEG_PATH", "ffmpeg")
+FFMPEG_ERROR_TAIL = 4096
+
+_segment_executor = None
+_segment_workers = 0
+_segment_executor_lock = threading.Lock()
+
+class PipelineStage:
+    """Busy-time accounting and queue hand-off for one stage of the analysis pipeline
+    
+    Time spent blocked on a queue counts as idle, so utilisation shows
+    which stage the others are waiting for.
+    """
+    
+    def __init__(self, name, stop_event):
+        self.name = name
+        self.stop_event = stop_event
+        self.busy_seconds = 0.0
+    
+    @contextmanager
+    def busy(self):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.busy_seconds += time.perf_counter() - started
+    
+    def put(self, out_queue, item):
+        """Hand an item to the next stage; returns False if the pipeline was stopped"""
+        while not self.stop_event.is_set():
+            try:
+                out_queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+    
+    def utilisation(self, elapsed):
+        return self.busy_seconds / elapsed if elapsed > 0 else 0.0
+
+# Video Processing Functions
+def frame_in_window(frame_number, window_stride=30, frames_per_window=16, skip_decode=True):
+    """Whether a (1-based) frame is part of any analysis window, i.e. must be decoded"""
+    position_in_stride = frame_number % window_stride
+    return (not skip_decode or window_stride <= frames_per_window or
+            position_in_stride == 0 or position_in_stride > window_stride - frames_per_window)
+
+def iter_sampled_frames(cap, window_stride=30, frames_per_window=16, skip_decode=True,
+                        start_frame=0, end_frame=None):
+    """Yield (frame_number, frame) for frames that end up in an analysis window.
+    
+    Frames that no window will ever contain are only grabbed, not decoded.
+    Frame numbers are 1-based; the capture must already be positioned at
+    start_frame and iteration stops after end_frame.
+    """
+    frame_number = start_frame
+    while end_frame is None or frame_number < end_frame:
+        frame_number += 1
+        
+        if frame_in_window(frame_number, window_stride, frames_per_window, skip_decode):
+            ret, frame = cap.read()
+            if not ret:
+                break
+            yield frame_number, frame
+        elif not cap.grab():
+            break
+
+def ffmpeg_available(ffmpeg_path=FFMPEG_PATH):
+    return shutil.which(ffmpeg_path) is not None
+
+def resolve_decoder(decoder=VIDEO_DECODER):
+    """The decoder an analysis actually uses; ffmpeg falls back to OpenCV when it isn't installed"""
+    return 'opencv' if decoder == 'ffmpeg' and not ffmpeg_available() else decoder
+
+def iter_ffmpeg_frames(video_path, fps, image_size=(64, 64), window_stride=30, frames_per_window=16,
+                       skip_decode=True, start_frame=0, end_frame=None, ffmpeg_path=FFMPEG_PATH):
+    """Yield (frame_number, frame) like iter_sampled_frames, decoded and scaled by an ffmpeg subprocess
+    
+    ffmpeg drops frames outside every window and scales the rest to
+    image_size, so only small raw frames cross the pipe and no
+    full-resolution frame is ever copied into Python. Frames are BGR like
+    OpenCV's. Seeking to start_frame is by timestamp, so assumes constant fps.
+    """
+    width, height = image_size
+    filters = []
+    if skip_decode and window_stride > frames_per_window:
+        # Same frames as frame_in_window; ffmpeg's n counts from 0 at the seek point
+        offset = start_frame + 1
+        filters.append(f"select='eq(mod(n+{offset},{window_stride}),0)"
+                       f"+gt(mod(n+{offset},{window_stride}),{window_stride - frames_per_window})'")
+    filters.append(f"scale={width}:{height}:flags=bilinear")
+    
+    command = [ffmpeg_path, "-v", "error", "-nostdin"]
+    if start_frame > 0:
+        command += ["-ss", f"{start_frame / fps:.6f}"]
+    command += ["-i", video_path, "-an", "-vf", ",".join(filters), "-fps_mode", "passthrough",
+                "-f", "rawvideo", "-pix_fmt", "bgr24", "pipe:1"]
+    
+    frame_bytes = width * height * 3
+    # Damaged streams can log far more than a pipe buffer; a file never blocks ffmpeg
+    with tempfile.TemporaryFile() as errors:
+        process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=errors, bufsize=frame_bytes * 16)
+        frames_read = 0
+        try:
+            frame_number = start_frame
+            while end_frame is None or frame_number < end_frame:
+                frame_number += 1
+                if not frame_in_window(frame_number, window_stride, frames_per_window, skip_decode):
+                    continue
+                
+                data = process.stdout.read(frame_bytes)
+                if len(data) < frame_bytes:
+                    break
+                frames_read += 1
+                yield frame_number, np.frombuffer(data, dtype=np.uint8).reshape(height, width, 3)
+        finally:
+            process.kill()
+            process.stdout.close()
+            process.wait()
+        
+        if frames_read == 0 and process.returncode not in (0, -9):
+            # The last few KB hold the error that stopped it
+            errors.seek(max(0, errors.seek(0, os.SEEK_END) - FFMPEG_ERROR_TAIL))
+            message = errors.read().decode(errors='replace').strip()
+            raise IOError(f"ffmpeg could not decode {video_path}: {message}")
+
+def read_full_frame(video_path, frame_number):
+    """Decode one full-resolution frame (1-based) by seeking to it; None if it can't be read"""
+    cap = cv2.VideoCapture(video_path)
+    try:
+        cap.set(cv2.CAP_PROP_POS_FRAMES, frame_number - 1)
+        ret, frame = cap.read()
+        return frame if ret else None
+    finally:
+        cap.release()
+
+def scan_video_segment(video_path, user_id, video_id, detector, start_frame=0, end_frame=None,
+                       progress_bar=None, status_text=None, on_incident=None, batch_size=8,
+                       max_batch_wait=2.0, window_stride=30, frames_per_window=None, skip_decode=True,
+                       feature_cache=True, motion_threshold=0.0, stats=None, scores_path=None,
+                       confidence_threshold=CONFIDENCE_THRESHOLD, incident_writer=None,
+                       checkpoint_interval=None, resume_from=None, decoder=VIDEO_DECODER):
+    """Score the windows ending in frames (start_frame, end_frame] and return their incidents
+    
+    Runs as a pipeline: a decode thread reads and resizes frames, an
+    inference thread batches windows through the model, and the calling
+    thread records results (timeline, screenshots, incidents, progress).
+    Per-stage utilisation is added to stats['stage_utilisation'].
+    
+    Queued windows only hold model-sized frames. With OpenCV, the full
+    frame at each scored window's end is kept aside until the window is
+    scored, for its screenshot. With decoder="ffmpeg" (and ffmpeg
+    installed) frames arrive already scaled to the model size, so
+    incident screenshots are read back from the video by seeking.
+    
+    With feature_cache and a splittable model, each frame is run through the
+    frame encoder once and windows only run the temporal head on cached
+    embeddings, so small strides cost little more than large ones.
+    
+    Windows whose motion_score is below motion_threshold are not sent to the
+    model. Window counts are added to the optional stats dict.
+    
+    Every scored window's confidence is written to the ScoreTimeline at
+    scores_path (if given); windows above confidence_threshold are incidents.
+    
+    Every checkpoint_interval seconds, everything scored so far is saved
+    (incidents via incident_writer) and recorded as a checkpoint of the
+    segment starting at start_frame. resume_from continues after such a
+    checkpoint; the returned incidents are only those found after it.
+    """
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        raise IOError(f"Could not open video file: {video_path}")
+    
+    try:
+        fps = cap.get(cv2.CAP_PROP_FPS)
+        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        frames_per_window = frames_per_window or detector.sequence_length
+        
+        # Re-read the frames before the segment (or checkpoint) so its first windows are complete;
+        # this rebuilds the frame buffer, so checkpoints don't need to store it
+        begin = start_frame if resume_from is None else resume_from
+        read_from = max(0, begin - frames_per_window)
+        if resolve_decoder(decoder) != decoder:
+            print(f"⚠️ {FFMPEG_PATH} not found - decoding with OpenCV")
+            decoder = 'opencv'
+        if decoder == 'opencv' and read_from > 0:
+            cap.set(cv2.CAP_PROP_POS_FRAMES, read_from)
+        
+        incidents = []
+        stats = stats if stats is not None else {}
+        stats.setdefault('windows_analyzed', 0)
+        stats.setdefault('windows_skipped', 0)
+        stats.setdefault('incidents', 0)
+        use_feature_cache = feature_cache and detector.supports_feature_cache()
+        if use_feature_cache:
+            features = FeatureCache(frames_per_window)
+            
+            def score_cached_windows(end_positions):
+                return detector.detect_violence_features(features.windows(end_positions, detector.encode_frames))
+            
+            batcher = WindowBatcher(detector, batch_size=batch_size, max_wait=max_batch_wait,
+                                    scorer=score_cached_windows)
+        else:
+            batcher = WindowBatcher(detector, batch_size=batch_size, max_wait=max_batch_wait)
+        
+        timeline = ScoreTimeline(scores_path, 'r+') if scores_path else None
+        screenshot_writer = get_screenshot_writer()
+        screenshot_writes = []
+        # Full frame at the end of each window in flight, by frame number; the sink pops them once scored
+        screenshot_frames = {}
+        screenshot_dir = f"screenshots/user_{user_id}"
+        os.makedirs(screenshot_dir, exist_ok=True)
+        
+        # Decode → inference → sink, each stage on its own thread, joined by bounded queues
+        stop_event = threading.Event()
+        decode = PipelineStage("decode", stop_event)
+        inference = PipelineStage("inference", stop_event)
+        sink = PipelineStage("sink", stop_event)
+        decode_queue = queue.Queue(maxsize=PIPELINE_QUEUE_SIZE)
+        sink_queue = queue.Queue(maxsize=PIPELINE_QUEUE_SIZE)
+        
+        def decode_stage():
+            """Read and resize frames; emit windows, progress and checkpoint markers"""
+            if decoder == 'ffmpeg':
+                sampled_frames = iter_ffmpeg_frames(video_path, fps, detector.image_size, window_stride,
+                                                    frames_per_window, skip_decode, start_frame=read_from,
+                                                    end_frame=end_frame)
+            else:
+                sampled_frames = iter_sampled_frames(cap, window_stride, frames_per_window, skip_decode,
+                                                     start_frame=read_from, end_frame=end_frame)
+            try:
+                frame_buffer = FrameRingBuffer(frames_per_window, detector.image_size)
+                next_checkpoint = time.monotonic() + (checkpoint_interval or 0)
+                last_window_frame = 0
+                
+                while True:
+                    items = []
+                    with decode.busy():
+                        sampled = next(sampled_frames, None)
+                        if sampled is None:
+                            break
+                        frame_count, frame = sampled
+                        frame_buffer.push(frame)
+                        
+                        if frame_count > begin and frame_count % window_stride == 0 and frame_buffer.is_full():
+                            if motion_threshold > 0 and motion_score(frame_buffer.window()) < motion_threshold:
+                                stats['windows_skipped'] += 1
+                            else:
+                                stats['windows_analyzed'] += 1
+                                if decoder == 'opencv':
+                                    screenshot_frames[frame_count] = frame
+                                if use_feature_cache:
+                                    # Only the frames the feature cache hasn't seen yet
+                                    new_frames = frame_buffer.latest(min(frame_count - last_window_frame, frames_per_window))
+                                    last_window_frame = frame_count
+                                    items.append(('window', frame_count, new_frames))
+                                else:
+                                    items.append(('window', frame_count, frame_buffer.window()))
+                            items.append(('progress', frame_count))
+                            
+                            if checkpoint_interval and time.monotonic() >= next_checkpoint:
+                                next_checkpoint = time.monotonic() + checkpoint_interval
+                                items.append(('checkpoint', frame_count, stats['windows_analyzed'],
+                                              stats['windows_skipped']))
+                    
+                    for item in items:
+                        if not decode.put(decode_queue, item):
+                            return
+                
+                decode.put(decode_queue, ('end',))
+            except BaseException as e:
+                decode.put(decode_queue, ('error', e))
+            finally:
+                sampled_frames.close()
+        
+        def inference_stage():
+            """Batch windows through the model; markers pass through after the windows before them"""
+            try:
+                while True:
+                    try:
+                        item = decode_queue.get(timeout=0.1)
+                    except queue.Empty:
+                        if stop_event.is_set():
+                            return
+                        # Don't hold a partial batch while decode is slow
+                        if batcher.windows and time.monotonic() - batcher.first_added_at >= max_batch_wait:
+                            with inference.busy():
+                                scored = batcher.flush()
+                            inference.put(sink_queue, ('scored', scored))
+                        continue
+                    
+                    if item[0] == 'window':
+                        _, frame_count, frames = item
+                        with inference.busy():
+                            if use_feature_cache:
+                                frames = features.add_frames(frames)
+                            scored = batcher.add(frames, frame_count)
+                        if scored and not inference.put(sink_queue, ('scored', scored)):
+                            return
+                        continue
+                    
+                    if item[0] in ('checkpoint', 'end'):
+                        with inference.busy():
+                            scored = batcher.flush()
+                        if scored:
+                            inference.put(sink_queue, ('scored', scored))
+                    if not inference.put(sink_queue, item) or item[0] in ('end', 'error'):
+                        return
+            except BaseException as e:
+                inference.put(sink_queue, ('error', e))
+        
+        def record_incidents(scored_windows):
+            for window_frame_count, (is_violent, confidence) in scored_windows:
+                window_frame = screenshot_frames.pop(window_frame_count, None)
+                if timeline is not None:
+                    index = window_index(window_frame_count, window_stride)
+                    timeline.set(index, confidence)
+                    # Judge the stored (e.g. float16) score, as re-deriving from the timeline does
+                    confidence = float(timeline.scores[index])
+                if confidence <= confidence_threshold:
+                    continue
+                
+                timestamp_seconds = window_frame_count / fps
+                
+                # Encoded (and, without a full frame, read back) off-thread; the scan never waits on disk
+                if window_frame is None:
+                    window_frame = lambda frame_number=window_frame_count: read_full_frame(video_path, frame_number)
+                screenshot_path, write = screenshot_writer.save(
+                    window_frame, f"{screenshot_dir}/incident_{video_id}_{int(timestamp_seconds)}")
+                screenshot_writes.append(write)
+                
+                incident = {
+                    'timestamp_seconds': timestamp_seconds,
+                    'timestamp_formatted': format_timestamp(timestamp_seconds),
+                    'confidence': confidence,
+                    'frame_number': window_frame_count,
+                    'screenshot_path': screenshot_path
+                }
+                incidents.append(incident)
+                stats['incidents'] += 1
+                
+                if incident_writer:
+                    incident_writer.add(incident)
+                if on_incident:
+                    on_incident(incident)
+        
+        def save_checkpoint(frame_number, windows_analyzed, windows_skipped):
+            # Everything up to frame_number must be durable before the checkpoint says so
+            if timeline is not None:
+                timeline.flush()
+            screenshot_writer.wait(screenshot_writes)
+            screenshot_writes.clear()
+            if incident_writer:
+                incident_writer.flush()
+            save_analysis_checkpoint(video_id, start_frame, frame_number, windows_analyzed,
+                                     windows_skipped, stats['incidents'])
+        
+        threads = [
+            threading.Thread(target=decode_stage, name=f"decode-{video_id}", daemon=True),
+            threading.Thread(target=inference_stage, name=f"inference-{video_id}", daemon=True)
+        ]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        
+        # The sink runs on the calling thread, which owns the progress widgets
+        try:
+            next_status_frame = begin + 300
+            while True:
+                item = sink_queue.get()
+                if item[0] == 'end':
+                    break
+                if item[0] == 'error':
+                    raise item[1]
+                
+                with sink.busy():
+                    if item[0] == 'scored':
+                        record_incidents(item[1])
+                    elif item[0] == 'checkpoint':
+                        save_checkpoint(*item[1:])
+                    elif item[0] == 'progress' and progress_bar:
+                        progress = item[1] / total_frames
+                        progress_bar.progress(min(progress, 1.0))
+                        
+                        if status_text and item[1] >= next_status_frame:
+                            next_status_frame += 300
+                            status_text.text(f"🔍 Analyzing... {progress:.1%} complete")
+        finally:
+            stop_event.set()
+            for thread in threads:
+                thread.join()
+        
+        if timeline is not None:
+            timeline.flush()
+        # Screenshots must be on disk before the results are shown
+        screenshot_writer.wait(screenshot_writes)
+        if incident_writer:
+            incident_writer.flush()
+        
+        elapsed = time.perf_counter() - started
+        stats['stage_utilisation'] = {stage.name: stage.utilisation(elapsed) for stage in (decode, inference, sink)}
+        print("📊 Pipeline utilisation: " + ", ".join(
+            f"{name} {utilisation:.0%}" for name, utilisation in stats['stage_utilisation'].items()))
+        return incidents
+    
+    finally:
+        cap.release()
+
+def _scan_segment_in_worker(video_path, user_id, video_id, model_path, backend, start_frame, end_frame,
+                            options, checkpoint=None):
+    """Entry point for segment worker processes; saves the segment's incidents and returns (incidents, stats)"""
+    detector = get_detector(model_path, backend)
+    stats = _checkpoint_stats(checkpoint)
+    incidents = scan_video_segment(video_path, user_id, video_id, detector,
+                                   start_frame=start_frame, end_frame=end_frame, stats=stats,
+                                   incident_writer=IncidentWriter(video_id, user_id),
+                                   resume_from=checkpoint['frame_number'] if checkpoint else None, **options)
+    return incidents, stats
+
+def _warm_up_segment_worker(model_path, backend):
+    """Load the detector once when a segment worker starts"""
+    get_detector(model_path, backend)
+
+def get_segment_executor(workers, model_path, backend):
+    """Process-wide pool of segment workers, kept warm between videos
+    
+    Workers load the model once when they start rather than once per
+    video. At most one worker per CPU is started; further segments queue.
+    The pool is only replaced if it has to grow (or a worker died, see
+    discard_segment_executor).
+    """
+    global _segment_executor, _segment_workers
+    
+    workers = max(1, min(workers, os.cpu_count() or 1))
+    with _segment_executor_lock:
+        if _segment_executor is None or _segment_workers < workers:
+            if _segment_executor is not None:
+                _segment_executor.shutdown(wait=False)
+            _segment_workers = workers
+            _segment_executor = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_warm_up_segment_worker,
+                initargs=(model_path, backend)
+            )
+        return _segment_executor
+
+def discard_segment_executor(executor):
+    """Drop a broken segment pool so the next video starts a new one"""
+    global _segment_executor
+    
+    with _segment_executor_lock:
+        if _segment_executor is executor:
+            _segment_executor = None
+    executor.shutdown(wait=False)
+
+def _checkpoint_stats(checkpoint):
+    """Window and incident counts to continue from (zero without a checkpoint)"""
+    return {key: checkpoint[key] if checkpoint else 0 for key in ('windows_analyzed', 'windows_skipped', 'incidents')}
+
+def saved_incidents(video_id):
+    """A video's saved incidents as incident dicts, in timestamp order"""
+    return [
+        {
+            'timestamp_seconds': incident[0],
+            'timestamp_formatted': format_timestamp(incident[0]),
+            'confidence': incident[1],
+            'frame_number': incident[2],
+            'screenshot_path': incident[3]
+        }
+        for incident in get_video_incidents(video_id)
+    ]
+
+def plan_segments(total_frames, segments, min_segment_frames):
+    """Split a video into at most `segments` contiguous (start, end) frame ranges
+    
+    The last range is open-ended (end None) so frames beyond an inaccurate
+    CAP_PROP_FRAME_COUNT are still analysed.
+    """
+    segments = max(1, min(segments, total_frames // max(min_segment_frames, 1)))
+    bounds = [total_frames * i // segments for i in range(segments)] + [None]
+    return [(bounds[i], bounds[i + 1]) for i in range(segments)]
+
+def process_video_file(video_path, user_id, video_id, detector, progress_bar, status_text,
+                       batch_size=8, max_batch_wait=2.0, window_stride=30, frames_per_window=None,
+                       skip_decode=True, segments=1, feature_cache=True, motion_threshold=0.0,
+                       alert_origin=None, confidence_threshold=CONFIDENCE_THRESHOLD, checkpoint_interval=None,
+                       decoder=VIDEO_DECODER, filename=None):
+    """Process uploaded video file
+    
+    With segments > 1 the video is split into time segments that are
+    analysed in parallel by a persistent pool of warmed-up worker processes
+    (see get_segment_executor) and merged in timestamp order.
+    
+    Alerts are queued as incidents are confirmed (see IncidentAlerter) and
+    name the video by filename, the name it was uploaded under (uploads are
+    stored by content hash); time-to-alert is measured from alert_origin
+    (default: now).
+    
+    Every window's score is kept in a ScoreTimeline, so incidents can later
+    be re-derived at another threshold without re-running the model.
+    
+    With checkpoint_interval, progress is checkpointed every that many
+    seconds and an interrupted analysis of the video resumes from its
+    checkpoints (segments are resumed only if the split is unchanged).
+    """
+    alert_origin = alert_origin or time.time()
+    filename = filename or os.path.basename(video_path)
+    try:
+        cap = cv2.VideoCapture(video_path)
+        if not cap.isOpened():
+            raise IOError(f"Could not open video file: {video_path}")
+        
+        fps = cap.get(cv2.CAP_PROP_FPS)
+        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        duration = total_frames / fps if fps > 0 else 0
+        cap.release()
+        
+        status_text.text(f"📹 Processing video: {duration:.1f}s, {total_frames:,} frames")
+        
+        scores_path = timeline_path(video_id)
+        checkpoints = get_analysis_checkpoints(video_id)
+        if checkpoints and os.path.exists(scores_path):
+            status_text.text(f"⏯️ Resuming analysis from checkpoint ({total_frames:,} frames)")
+        else:
+            checkpoints = {}
+            ScoreTimeline.create(scores_path, total_frames // window_stride).flush()
+        record_score_timeline(video_id, scores_path, window_stride, fps, confidence_threshold)
+        
+        options = {
+            'batch_size': batch_size,
+            'max_batch_wait': max_batch_wait,
+            'window_stride': window_stride,
+            'frames_per_window': frames_per_window,
+            'skip_decode': skip_decode,
+            'feature_cache': feature_cache,
+            'motion_threshold': motion_threshold,
+            'scores_path': scores_path,
+            'confidence_threshold': confidence_threshold,
+            'checkpoint_interval': checkpoint_interval,
+            'decoder': decoder
+        }
+        frames_per_window = frames_per_window or detector.sequence_length
+        segment_ranges = plan_segments(total_frames, segments, window_stride + frames_per_window)
+        
+        if len(segment_ranges) == 1:
+            # Incidents are written in batches as they are found rather than one commit each
+            writer = IncidentWriter(video_id, user_id)
+            alerter = IncidentAlerter(user_id, video_id, filename, alert_origin, before_alert=writer.flush)
+            checkpoint = checkpoints.get(0)
+            stats = _checkpoint_stats(checkpoint)
+            
+            scan_video_segment(video_path, user_id, video_id, detector,
+                               progress_bar=progress_bar, status_text=status_text,
+                               on_incident=alerter.add, stats=stats, incident_writer=writer,
+                               resume_from=checkpoint['frame_number'] if checkpoint else None, **options)
+        else:
+            status_text.text(f"🔍 Analyzing {len(segment_ranges)} segments in parallel...")
+            alerter = IncidentAlerter(user_id, video_id, filename, alert_origin)
+            stats = _checkpoint_stats(None)
+            executor = get_segment_executor(len(segment_ranges), detector.model_path, detector.backend)
+            futures = [
+                executor.submit(_scan_segment_in_worker, video_path, user_id, video_id,
+                                detector.model_path, detector.backend, start_frame, end_frame, options,
+                                checkpoints.get(start_frame))
+                for start_frame, end_frame in segment_ranges
+            ]
+            try:
+                for done, future in enumerate(as_completed(futures), 1):
+                    segment_incidents, segment_stats = future.result()
+                    for incident in segment_incidents:
+                        alerter.add(incident)
+                    for key in stats:
+                        stats[key] += segment_stats[key]
+                    progress_bar.progress(done / len(futures))
+            except BrokenProcessPool:
+                discard_segment_executor(executor)
+                raise
+            finally:
+                # A failed segment must not leave the others running into the next video
+                for future in futures:
+                    future.cancel()
+        
+        # Includes incidents saved before a resumed checkpoint
+        incidents = saved_incidents(video_id)
+        update_video_analysis_status(video_id, len(incidents), stats['windows_analyzed'], stats['windows_skipped'])
+        clear_analysis_checkpoints(video_id)
+        status_text.text(f"✅ Analysis complete! Found {len(incidents)} incidents")
+        
+        # Alerts go through the outbox; the background sender delivers them
+        if incidents:
+            alerter.finish(incidents)
+        else:
+            print(f"⚠️ No incidents found, skipping email")
+        
+        return incidents
+    
+    except Exception as e:
+        print(f"❌ Video processing error: {e}")
+        raise
+
+def rederive_video_incidents(job, confidence_threshold, source_video_id=None):
+    """Replace a video's incidents with the timeline windows above a new threshold
+    
+    No inference is run. Screenshots already taken for this video (or for
+    source_video_id, whose timeline it shares) are reused; frames that
+    become incidents only now are read from the video by seeking to them.
+    A source video of another user has its screenshots linked into this
+    user's directory rather than referenced.
+    """
+    timeline = ScoreTimeline(job['timeline_path'])
+    window_stride = job['window_stride']
+    fps = job['fps']
+    screenshot_dir = f"screenshots/user_{job['user_id']}"
+    screenshot_writer = get_screenshot_writer()
+    screenshot_writes = []
+    screenshots = {incident[2]: incident[3] for incident in get_video_incidents(job['id'])}
+    source_screenshots = {}
+    link_source = False
+    if source_video_id is not None:
+        source_screenshots = {incident[2]: incident[3] for incident in get_video_incidents(source_video_id)}
+        link_source = get_video_job(source_video_id)['user_id'] != job['user_id']
+    
+    incidents = []
+    cap = None
+    try:
+        for index in timeline.windows_above(confidence_threshold):
+            frame_number = window_end_frame(int(index), window_stride)
+            timestamp_seconds = frame_number / fps
+            path_stem = f"{screenshot_dir}/incident_{job['id']}_{int(timestamp_seconds)}"
+            screenshot_path = screenshots.get(frame_number)
+            if screenshot_path is None and frame_number in source_screenshots:
+                screenshot_path = source_screenshots[frame_number]
+                if link_source:
+                    screenshot_path = link_screenshot(screenshot_path, path_stem)
+            if screenshot_path is None:
+                screenshot_path = f"{path_stem}.{screenshot_writer.image_format}"
+            
+            if not os.path.exists(screenshot_path):
+                if cap is None:
+                    cap = cv2.VideoCapture(job['file_path'])
+                    os.makedirs(screenshot_dir, exist_ok=True)
+                cap.set(cv2.CAP_PROP_POS_FRAMES, frame_number - 1)
+                ret, frame = cap.read()
+                if ret:
+                    screenshot_path, write = screenshot_writer.save(frame, path_stem)
+                    screenshot_writes.append(write)
+            
+            incidents.append({
+                'timestamp_seconds': timestamp_seconds,
+                'timestamp_formatted': format_timestamp(timestamp_seconds),
+                'confidence': float(timeline.scores[index]),
+                'frame_number': frame_number,
+                'screenshot_path': screenshot_path
+            })
+    finally:
+        if cap is not None:
+            cap.release()
+    
+    screenshot_writer.wait(screenshot_writes)
+    replace_video_incidents(job['id'], job['user_id'], incidents, confidence_threshold)
+    return incidents
+
+# Utility Functions
+def format_timestamp(seconds):
+    """Format seconds to MM:SS"""
+    minutes = int(seconds // 60)
+    seconds = int(seconds % 60)
+    return f"{minutes:02d}:{seconds:02d}"
+
+def get_video_info(video_path):
+    """Get video file information"""
+    cap = cv2.VideoCapture(video_path)
+    if cap.isOpened():
+        fps = cap.get(cv2.CAP_PROP_FPS)
+        frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        duration = frame_count / fps if fps > 0 else 0
+        width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        cap.release()
+        
+        return {
+            'duration': duration,
+            'fps': fps,
+            'frame_count': frame_count,
+            'resolution': f"{width}x{height}",
+            'size_mb': os.path.getsize(video_path) / (1024 * 1024)
+        }
+    return None